@@ -1,3 +1,5 @@
+import asyncio
+import click
 import logging
 import os
 from flask import Flask, current_app, request
@@ -10,19 +12,31 @@ from .endpoints.biosamples import biosamples
 from .endpoints.cohorts import cohorts
 from .endpoints.datasets import datasets
 from .network.endpoints import network
+from .network.utils.network_beacons import network_registry
 from .utils.exceptions import APIException
 from werkzeug.exceptions import HTTPException
 from .authz.middleware import authz_middleware
 from .config_files.config import Config
 from .utils.beacon_response import beacon_error_response
-from .utils.beacon_request import save_request_data, validate_request, verify_permissions
+from .utils.beacon_request import request_body_validator, save_request_data, validate_request, verify_permissions
 from .utils.beacon_response import init_response_data
 from .utils.censorship import set_censorship
+from .utils.gohan_utils import build_allele_index
+from .utils.http import init_http, io_loop_to_sync
+from .utils.reference import preload_gene_positions
 
 REQUEST_SPEC_RELATIVE_PATH = "beacon-v2/framework/json/requests/"
 BEACON_MODELS = ["analyses", "biosamples", "cohorts", "datasets", "individuals", "runs", "variants"]
 
-app = Flask(__name__)
+
+class BeaconApp(Flask):
+    def async_to_sync(self, func):
+        # run async views and handlers on the worker's persistent io loop rather than a new loop per call,
+        # so that connection pools, caches and in-flight requests are shared across requests
+        return io_loop_to_sync(func)
+
+
+app = BeaconApp(__name__)
 
 # find path for beacon-v2 spec
 app_parent_dir = os.path.dirname(app.root_path)
@@ -31,11 +45,17 @@ app.config.from_mapping(BEACON_REQUEST_SPEC_URI=beacon_request_spec_uri)
 
 app.config.from_object(Config)
 
+# load and compile the request schema once, rather than on every POST
+request_body_validator(beacon_request_spec_uri)
+
 # all logs are printed in dev mode regardless of level
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s", handlers=[logging.StreamHandler()]
 )
 
+# connection pool settings for upstream services, sessions are opened lazily and closed at exit
+init_http(app.config)
+
 # attach authz middleware to the Flask app
 authz_middleware.attach(app)
 
@@ -63,6 +83,25 @@ with app.app_context():
     # load blueprint for network
     if current_app.config["USE_BEACON_NETWORK"]:
         app.register_blueprint(network)
+        # start filling in details of other beacons now, rather than on the first network request
+        network_registry.ensure_refreshing(app.config, app.logger)
+
+
+@app.cli.command("preload-gene-positions")
+@click.argument("assembly_id")
+def preload_gene_positions_command(assembly_id):
+    """Save positions for every gene in an assembly to the gene position store."""
+    num_saved = asyncio.run(preload_gene_positions(assembly_id))
+    click.echo(f"saved {num_saved} gene positions for {assembly_id}")
+
+
+@app.cli.command("build-allele-index")
+@click.option("--full", is_flag=True, help="Rebuild from scratch instead of updating only assemblies that changed.")
+def build_allele_index_command(full):
+    """Build or update the allele index used to answer sequence queries for variants not in gohan. Run after ingests."""
+    indexed = asyncio.run(build_allele_index(full))
+    for assembly_id, count in indexed.items():
+        click.echo(f"{assembly_id}: {count} variants indexed")
 
 
 @app.before_request
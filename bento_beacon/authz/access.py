@@ -1,8 +1,8 @@
 import aiocache
-import aiohttp
 from flask import current_app
 from .headers import auth_header_from_request
-from ..utils.http import tcp_connector
+from ..utils.cache import AsyncCache
+from ..utils.http import on_io_loop, upstream_session
 
 __all__ = [
     "get_access_token",
@@ -10,18 +10,32 @@ __all__ = [
 ]
 
 
+@on_io_loop
 @aiocache.cached()
 async def get_token_endpoint_from_openid_config_url(url: str):
-    async with aiohttp.ClientSession(connector=tcp_connector(current_app.config)) as s:
-        async with s.get(url) as r:
+    s = upstream_session("authz")
+    async with s.get(url) as r:
 
-            if not r.ok:
-                raise Exception(f"Received not-OK response from OIDC config URL: {r.status_code}")
+        if not r.ok:
+            raise Exception(f"Received not-OK response from OIDC config URL: {r.status_code}")
 
-            response = await r.json()
+        response = await r.json()
     return response["token_endpoint"]
 
 
+# client credentials tokens, keyed by identity provider and client id
+# tokens are dropped from the cache a little before they expire, so the next call fetches a fresh one
+access_token_cache = AsyncCache("access_tokens")
+
+
+def access_token_ttl(token_response: dict | None) -> float:
+    if not token_response:
+        # don't cache failures
+        return 0
+    leeway = current_app.config["AUTHZ_TOKEN_REFRESH_LEEWAY_SECONDS"]
+    return max(token_response.get("expires_in", 0) - leeway, 0)
+
+
 async def get_access_token() -> str | None:
     logger = current_app.logger
 
@@ -33,6 +47,19 @@ async def get_access_token() -> str | None:
         logger.error("Could not retrieve access token; one of OPENID_CONFIG_URL | CLIENT_ID | CLIENT_SECRET is not set")
         return None
 
+    # concurrent callers share a single in-flight token request
+    token_response = await access_token_cache.get_or_load(
+        (oidc_config_url, client_id),
+        lambda: retrieve_access_token(oidc_config_url, client_id, client_secret),
+        ttl=access_token_ttl,
+    )
+    return token_response["access_token"] if token_response else None
+
+
+@on_io_loop
+async def retrieve_access_token(oidc_config_url: str, client_id: str, client_secret: str) -> dict | None:
+    logger = current_app.logger
+
     try:
         token_endpoint = await get_token_endpoint_from_openid_config_url(oidc_config_url)
         current_app.logger.info(f"token_endpoint: {token_endpoint}")
@@ -40,23 +67,23 @@ async def get_access_token() -> str | None:
         logger.error(f"Could not retrieve access token; got exception from OpenID config URL: {e}")
         return None
 
-    async with aiohttp.ClientSession(connector=tcp_connector(current_app.config)) as s:
-        async with s.post(
-            token_endpoint,
-            data={
-                "grant_type": "client_credentials",
-                "client_id": client_id,
-                "client_secret": client_secret,
-            },
-        ) as token_res:
+    s = upstream_session("authz")
+    async with s.post(
+        token_endpoint,
+        data={
+            "grant_type": "client_credentials",
+            "client_id": client_id,
+            "client_secret": client_secret,
+        },
+    ) as token_res:
 
-            res = await token_res.json()
+        res = await token_res.json()
 
-            if not token_res.ok:
-                logger.error(f"Could not retrieve access token; got error response: {res}")
-                return None
+        if not token_res.ok:
+            logger.error(f"Could not retrieve access token; got error response: {res}")
+            return None
 
-    return res["access_token"]
+    return res
 
 
 async def create_access_header_or_fall_back():
@@ -1,4 +1,6 @@
-from flask import request
+import hashlib
+import json
+from flask import current_app, request, Request
 from bento_lib.auth.middleware.flask import FlaskAuthMiddleware
 from bento_lib.auth.permissions import (
     Level,
@@ -16,6 +18,7 @@ from bento_lib.auth.permissions import (
 
 from ..config_files.config import Config
 from ..utils.beacon_response import middleware_meta_callback
+from ..utils.cache import AsyncCache
 
 __all__ = [
     "authz_middleware",
@@ -51,6 +54,11 @@ permissions_by_scope_level = {
     LEVEL_DATASET: [P_QUERY_DATA, P_DOWNLOAD_DATA, P_QUERY_DATASET_LEVEL_COUNTS, P_QUERY_DATASET_LEVEL_BOOLEAN],
 }
 
+# authz results keyed by (token hash, resource, checked permissions)
+# kept only briefly, so that changes in permissions are picked up quickly
+# all anonymous requests share the same entries
+permissions_cache = AsyncCache("permissions", max_size=Config.AUTHZ_PERMISSIONS_CACHE_MAX_SIZE)
+
 
 async def evaluate_permissions_on_resource(resource: dict) -> dict[Permission, bool]:
     """
@@ -63,8 +71,35 @@ async def evaluate_permissions_on_resource(resource: dict) -> dict[Permission, b
 
     level = resource_level(resource)
     checked_permissions = permissions_by_scope_level[level]
-    r = await authz_middleware.async_evaluate_to_dict(request, [resource], checked_permissions, mark_authz_done=True)
-    return r[0] if r else {}
+    key = (
+        token_fingerprint(request),
+        json.dumps(resource, sort_keys=True),
+        tuple(str(p) for p in checked_permissions),
+    )
+    ttl = current_app.config["AUTHZ_PERMISSIONS_CACHE_TTL_SECONDS"]
+    permissions = await permissions_cache.get_or_load(
+        key,
+        lambda: evaluate_permissions_with_authz(request, resource, checked_permissions),
+        # don't hold on to empty responses
+        ttl=lambda p: ttl if p else 0,
+    )
+
+    # authz is done for this request whether or not the result came from the cache
+    authz_middleware.mark_authz_done(request)
+    return dict(permissions)
+
+
+async def evaluate_permissions_with_authz(
+    r: Request, resource: dict, checked_permissions: list[Permission]
+) -> dict[Permission, bool]:
+    result = await authz_middleware.async_evaluate_to_dict(r, [resource], checked_permissions, mark_authz_done=True)
+    return result[0] if result else {}
+
+
+def token_fingerprint(r: Request) -> str | None:
+    # hash rather than keep bearer tokens in memory; None for anonymous requests
+    token = r.headers.get("authorization")
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
 
 
 def resource_level(resource: dict) -> Level:
@@ -32,6 +32,11 @@ def has_download_data_permissions(permissions: PermissionsDict) -> bool:
     return permissions.get(P_DOWNLOAD_DATA, False)
 
 
+# hashable summary of granted permissions, for caching anything that depends on what the user is allowed to see
+def permissions_tier(permissions: PermissionsDict) -> frozenset[str]:
+    return frozenset(str(p) for p, granted in permissions.items() if granted)
+
+
 def bool_permission_for_scope(is_dataset_level: bool) -> Permission:
     return P_QUERY_DATASET_LEVEL_BOOLEAN if is_dataset_level else P_QUERY_PROJECT_LEVEL_BOOLEAN
 
@@ -38,6 +38,20 @@ class Config:
 
     DEFAULT_PAGINATION_PAGE_SIZE = 10
 
+    # how long matches for a paginated record query are kept for retrieving later pages
+    PAGINATION_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_PAGINATION_CACHE_TTL_SECONDS", 600))
+
+    # streamed (ndjson) record responses retrieve phenopackets for this many individuals at a time
+    RECORD_STREAM_CHUNK_SIZE = int(os.environ.get("BEACON_RECORD_STREAM_CHUNK_SIZE", 100))
+
+    # raw results (counts, matching ids) of repeated queries are reused for this long, censorship is applied per request
+    # new katsu data is only seen once this runs out, so keep it short
+    QUERY_RESULT_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_QUERY_RESULT_CACHE_TTL_SECONDS", 30))
+
+    # batch variant queries (/g_variants/batch): most queries accepted in one request, and how many run at once
+    BATCH_VARIANT_QUERY_MAX_QUERIES = int(os.environ.get("BEACON_BATCH_VARIANT_QUERY_MAX_QUERIES", 1000))
+    BATCH_VARIANT_QUERY_MAX_CONCURRENT = int(os.environ.get("BEACON_BATCH_VARIANT_QUERY_MAX_CONCURRENT", 16))
+
     BENTO_DEBUG = BENTO_DEBUG
     BENTO_DOMAIN = os.environ.get("BENTOV2_DOMAIN")
     BEACON_BASE_URL = os.environ.get("BEACON_BASE_URL")
@@ -137,6 +151,14 @@ class Config:
         },
         "/overview": {},
     }
+    # -------------------
+    # pooled http connections to upstream services
+
+    HTTP_CONNECTION_LIMIT = int(os.environ.get("BEACON_HTTP_CONNECTION_LIMIT", 100))
+    HTTP_CONNECTION_LIMIT_PER_HOST = int(os.environ.get("BEACON_HTTP_CONNECTION_LIMIT_PER_HOST", 20))
+    HTTP_DNS_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_HTTP_DNS_CACHE_TTL_SECONDS", 300))
+    HTTP_KEEPALIVE_TIMEOUT_SECONDS = int(os.environ.get("BEACON_HTTP_KEEPALIVE_TIMEOUT_SECONDS", 30))
+
     # -------------------
     # katsu
 
@@ -153,10 +175,21 @@ class Config:
     KATSU_PUBLIC_RULES = "/api/discovery_rules"
     KATSU_TIMEOUT = int(os.environ.get("BEACON_KATSU_TIMEOUT", 180))
 
+    # projects and datasets are cached, then served stale for a while longer as they are refreshed in the background
+    KATSU_CATALOGUE_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_KATSU_CATALOGUE_CACHE_TTL_SECONDS", 60))
+    KATSU_CATALOGUE_STALE_SECONDS = int(os.environ.get("BEACON_KATSU_CATALOGUE_STALE_SECONDS", 600))
+
+    # overview statistics (e.g. for the beacon ui landing page) are reused for this long
+    KATSU_OVERVIEW_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_KATSU_OVERVIEW_CACHE_TTL_SECONDS", 60))
+
     MAP_EXTRA_PROPERTIES_TO_INFO = str_to_bool(os.environ.get("MAP_EXTRA_PROPERTIES_TO_INFO", ""))
 
     MAX_RETRIES_FOR_CENSORSHIP_PARAMS = int(os.environ.get("MAX_RETRIES_FOR_CENSORSHIP_PARAMS", 2))
 
+    # censorship rules only change when discovery config is edited
+    # there's no signal for that, and each worker has its own cache, so edits take up to this long to apply
+    CENSORSHIP_SETTINGS_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_CENSORSHIP_SETTINGS_CACHE_TTL_SECONDS", 60))
+
     # don't allow queries over arbitrary phenopacket or experiment fields without permission
     CENSORED_METADATA_QUERY_USES_DISCOVERY_CONFIG_ONLY = True
 
@@ -169,27 +202,59 @@ class Config:
     GOHAN_OVERVIEW_ENDPOINT = "/variants/overview"
     GOHAN_TIMEOUT = int(os.environ.get("BEACON_GOHAN_TIMEOUT", 60))
 
+    # wide searches are split into tiles of this many bases, searched a few at a time
+    GOHAN_RANGE_TILE_SIZE = int(os.environ.get("BEACON_GOHAN_RANGE_TILE_SIZE", 1_000_000))
+    GOHAN_MAX_CONCURRENT_REQUESTS = int(os.environ.get("BEACON_GOHAN_MAX_CONCURRENT_REQUESTS", 4))
+
+    # the variants overview is cached, then served stale for a while longer as it is refreshed in the background
+    GOHAN_OVERVIEW_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_GOHAN_OVERVIEW_CACHE_TTL_SECONDS", 60))
+    GOHAN_OVERVIEW_STALE_SECONDS = int(os.environ.get("BEACON_GOHAN_OVERVIEW_STALE_SECONDS", 600))
+    # except for checks that need recent counts, e.g. whether the allele index is up to date
+    GOHAN_RECENT_OVERVIEW_MAX_AGE_SECONDS = int(os.environ.get("BEACON_GOHAN_RECENT_OVERVIEW_MAX_AGE_SECONDS", 5))
+
+    # search and count results are cached until gohan has new data (or the ttl runs out),
+    # except for searches returning more calls than this, and up to a total number of cached calls
+    GOHAN_RESULT_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_GOHAN_RESULT_CACHE_TTL_SECONDS", 300))
+    GOHAN_RESULT_CACHE_MAX_CALLS = int(os.environ.get("BEACON_GOHAN_RESULT_CACHE_MAX_CALLS", 10_000))
+    GOHAN_RESULT_CACHE_MAX_TOTAL_CALLS = int(os.environ.get("BEACON_GOHAN_RESULT_CACHE_MAX_TOTAL_CALLS", 200_000))
+
+    # optional bloom filter of every allele in gohan, built with "flask build-allele-index", to be re-run after ingests
+    ALLELE_INDEX_PATH = os.environ.get("BEACON_ALLELE_INDEX_PATH")
+    ALLELE_INDEX_FALSE_POSITIVE_RATE = float(os.environ.get("BEACON_ALLELE_INDEX_FALSE_POSITIVE_RATE", 0.01))
+
     # -------------------
     # drs
 
     DRS_URL = os.environ.get("DRS_URL")
+    DRS_MAX_CONCURRENT_REQUESTS = int(os.environ.get("BEACON_DRS_MAX_CONCURRENT_REQUESTS", 10))
+    DRS_LINK_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_DRS_LINK_CACHE_TTL_SECONDS", 300))
 
     # -------------------
     # reference
     REFERENCE_URL = os.environ.get("REFERENCE_URL")
 
+    # gene coordinates are cached in memory, and also saved to a sqlite file if a path is given,
+    # e.g. /beacon/config/gene_positions.sqlite3 (fill it in bulk with "flask preload-gene-positions <assembly>")
+    GENE_POSITION_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_GENE_POSITION_CACHE_TTL_SECONDS", 24 * 60 * 60))
+    GENE_POSITION_CACHE_PATH = os.environ.get("BEACON_GENE_POSITION_CACHE_PATH")
+
     # -------------------
     # authorization
 
     #  - for contacting the Bento authorization service
     AUTHZ_URL: str = os.environ.get("BENTO_AUTHZ_SERVICE_URL", "")
     AUTHZ_ENABLED: bool = str_to_bool(os.environ.get("AUTHZ_ENABLED", "true"))
+    #  - permission evaluations are cached briefly per token, resource and permission set
+    AUTHZ_PERMISSIONS_CACHE_TTL_SECONDS = int(os.environ.get("BEACON_AUTHZ_PERMISSIONS_CACHE_TTL_SECONDS", 10))
+    AUTHZ_PERMISSIONS_CACHE_MAX_SIZE = int(os.environ.get("BEACON_AUTHZ_PERMISSIONS_CACHE_MAX_SIZE", 1000))
     #  - for retrieving a token from an OAuth2 IdP in order to make authorized requests to Katsu
     #     --> if this is disabled, <Authorization: ...> headers from the requestor will be forwarded instead.
     AUTHZ_BENTO_REQUESTS_ENABLED: bool = str_to_bool(os.environ.get("BEACON_AUTHZ_BENTO_REQUESTS_ENABLED", "true"))
     OPENID_CONFIG_URL: str = os.environ.get("BENTO_OPENID_CONFIG_URL", "")
     CLIENT_ID: str = os.environ.get("BEACON_CLIENT_ID", "")
     CLIENT_SECRET: str = os.environ.get("BEACON_CLIENT_SECRET", "")
+    #  - cached tokens are refreshed this many seconds before they expire
+    AUTHZ_TOKEN_REFRESH_LEEWAY_SECONDS = int(os.environ.get("BEACON_AUTHZ_TOKEN_REFRESH_LEEWAY_SECONDS", 60))
 
     # -------------------
     # handle injected config files
@@ -231,6 +296,13 @@ class Config:
 
     NETWORK_DEFAULT_TIMEOUT_SECONDS = NETWORK_CONFIG.get("network_default_timeout_seconds", 30)
     NETWORK_VARIANTS_QUERY_TIMEOUT_SECONDS = NETWORK_CONFIG.get("network_variants_query_timeout_seconds", GOHAN_TIMEOUT)
+
+    # details of other beacons are refreshed in the background, each on its own timer, and the last good details for a
+    # beacon are kept for a while if it stops responding
+    # with background refresh off, beacons are refreshed when their details are next needed
+    NETWORK_BACKGROUND_REFRESH = str_to_bool(os.environ.get("BEACON_NETWORK_BACKGROUND_REFRESH", "true"))
+    NETWORK_REFRESH_INTERVAL_SECONDS = NETWORK_CONFIG.get("network_refresh_interval_seconds", 300)
+    NETWORK_NODE_STALE_SECONDS = NETWORK_CONFIG.get("network_node_stale_seconds", 24 * 60 * 60)
     NETWORK_VALID_QUERY_ENDPOINTS = [
         "analyses",
         "biosamples",
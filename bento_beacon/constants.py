@@ -1,3 +1,5 @@
 GRANULARITY_BOOLEAN = "boolean"
 GRANULARITY_COUNT = "count"
 GRANULARITY_RECORD = "record"
+
+NDJSON_MIMETYPE = "application/x-ndjson"
@@ -1,9 +1,10 @@
-from flask import Blueprint, g
-from functools import reduce
+import asyncio
+from flask import Blueprint, current_app, g
 from ..authz.utils import has_download_data_permissions, requires_full_record_permissions
 from ..utils.beacon_request import summary_stats_requested
 from ..utils.beacon_response import (
     add_info_to_response,
+    add_pagination_to_response,
     add_stats_to_response,
     add_overview_stats_to_response,
     zero_count_response,
@@ -16,7 +17,9 @@ from ..utils.katsu_utils import (
     search_from_config,
     phenopackets_for_ids,
 )
-from ..utils.search import biosample_id_search
+from ..utils.pagination import cached_ids_for_page_token, paginate_ids
+from ..utils.query_cache import cached_query_result, query_fingerprint
+from ..utils.search import biosample_id_search, intersection_of_searches
 from ..utils.handover_utils import handover_for_ids
 from ..utils.exceptions import NotFoundException
 from ..utils.scope import scoped_route_decorator_for_blueprint
@@ -38,94 +41,129 @@ async def get_individuals(project_id=None):
     config_search_only = config_filters and not (variants_query or phenopacket_filters or experiment_filters)
 
     # return total count of individuals if no query
-    # TODO: save 400ms on beacon UI startup by not calling katsu twice
     if no_query:
         add_info_to_response("no query found, returning total count")
-        total_count = await katsu_total_individuals_count(project_id=project_id, dataset_id=dataset_id)
+        total_count_lookup = cached_query_result(
+            query_fingerprint("individuals", project_id),
+            lambda: katsu_total_individuals_count(project_id=project_id, dataset_id=dataset_id),
+        )
         if summary_stats_requested():
-            await add_overview_stats_to_response(project_id=project_id, dataset_id=dataset_id)
+            # the overview is censored for the caller and the total isn't, so they can't come from the same katsu call,
+            # but they're independent, so run them together
+            total_count, _ = await asyncio.gather(
+                total_count_lookup, add_overview_stats_to_response(project_id=project_id, dataset_id=dataset_id)
+            )
+        else:
+            total_count = await total_count_lookup
         return await build_query_response(num_total_results=total_count)
 
     # ----------------------------------------------------------
-    #  collect biosample ids from variant and experiment search
+    #  collect biosample ids from variant and experiment search,
+    #  then retrieve matching individuals filtered by any phenopacket filters
     # ----------------------------------------------------------
-    sample_ids = []
-
-    if search_sample_ids:
-        sample_ids = await biosample_id_search(
-            variants_query=variants_query,
-            experiment_filters=experiment_filters,
-            project_id=project_id,
-            dataset_id=dataset_id,
+
+    async def phenopacket_individuals_search():
+        sample_ids = []
+        if search_sample_ids:
+            sample_ids = await biosample_id_search(
+                variants_query=variants_query,
+                experiment_filters=experiment_filters,
+                project_id=project_id,
+                dataset_id=dataset_id,
+            )
+            if not sample_ids:
+                return []
+
+        # either of phenopacket_filters or sample_ids can be empty
+        return await katsu_filters_and_sample_ids_query(
+            phenopacket_filters, "phenopacket", sample_ids, project_id=project_id, dataset_id=dataset_id
         )
-        if not sample_ids:
-            return await zero_count_response()
 
     # -------------------------------
     #  get individuals
     # -------------------------------
 
-    individual_results = {}
+    async def individuals_search():
+        searches = []
 
-    # get individuals from katsu config search
-    if config_filters:
-        config_ids = await search_from_config(config_filters, project_id=project_id, dataset_id=dataset_id)
-        if not config_ids:
-            return await zero_count_response()
-        individual_results["config_ids"] = config_ids
+        # get individuals from katsu config search
+        if config_filters:
+            searches.append(search_from_config(config_filters, project_id=project_id, dataset_id=dataset_id))
 
-    if not config_search_only:
-        # retrieve all matching individuals from sample id search, filtered by any phenopacket filters
-        # either of phenopacket_filters or sample_ids can be empty
-        phenopacket_ids = await katsu_filters_and_sample_ids_query(
-            phenopacket_filters, "phenopacket", sample_ids, project_id=project_id, dataset_id=dataset_id
-        )
-        if not phenopacket_ids:
-            return await zero_count_response()
-        individual_results["phenopacket_ids"] = phenopacket_ids
+        if not config_search_only:
+            searches.append(phenopacket_individuals_search())
+
+        # config search is independent of the phenopacket search, so these run concurrently
+        return await intersection_of_searches(searches)
 
-    # baroque syntax but covers all cases
-    individual_ids = list(reduce(set.intersection, (set(ids) for ids in individual_results.values())))
+    # later pages of a record query reuse the matches saved when the first page was served,
+    # and repeated queries reuse matches from a recent search
+    individual_ids = cached_ids_for_page_token()
+    if individual_ids is None:
+        individual_ids = await cached_query_result(query_fingerprint("individuals", project_id), individuals_search)
+    if not individual_ids:
+        return await zero_count_response()
 
     if summary_stats_requested():
         await add_stats_to_response(individual_ids, project_id, dataset_id)
 
-    return await build_query_response(ids=individual_ids, full_record_handler=individuals_full_results)
+    return await build_query_response(
+        ids=individual_ids, full_record_handler=individuals_full_results, stream_handler=individuals_streamed_results
+    )
 
 
-# TODO: pagination (ideally after katsu search gets paginated)
 async def individuals_full_results(ids, project_id=None, dataset_id=None):
-
-    # temp
-    # if len(ids) > 100:
-    #     return {"message": "too many ids for full response"}
+    # only retrieve phenopackets for the requested page
+    page_ids, page_tokens = paginate_ids(ids)
+    if page_tokens:
+        add_pagination_to_response(page_tokens)
 
     handover_permission = has_download_data_permissions(g.permissions)
-    handover = (await handover_for_ids(ids, project_id, dataset_id)) if handover_permission else {}
-    phenopackets_by_result_set = (await phenopackets_for_ids(ids, project_id, dataset_id)).get("results", {})
-    result_ids = list(phenopackets_by_result_set.keys())
+    handover = (await handover_for_ids(page_ids, project_id, dataset_id)) if handover_permission else {}
+    phenopackets_by_result_set = (await phenopackets_for_ids(page_ids, project_id, dataset_id)).get("results", {})
     result_sets = {}
     num_total_results = 0
 
-    for r_id in result_ids:
-        results_this_id = phenopackets_by_result_set.get(r_id, {}).get("matches", [])
-        results_count = len(results_this_id)
-        num_total_results += results_count
-        result = {
-            "id": r_id,
-            "setType": "individual",
-            "exists": results_count > 0,
-            "resultsCount": results_count,
-            "results": results_this_id,
-        }
-        handover_this_id = handover.get(r_id, [])
-        if handover_this_id:
-            result["resultsHandovers"] = handover_this_id
+    for r_id, results_this_id in phenopackets_by_result_set.items():
+        result = individuals_result_set(r_id, results_this_id.get("matches", []), handover.get(r_id, []))
+        num_total_results += result["resultsCount"]
         result_sets[r_id] = result
 
+    # total across all pages
+    if page_tokens:
+        num_total_results = len(ids)
+
     return result_sets, num_total_results
 
 
+async def individuals_streamed_results(ids, project_id=None, dataset_id=None):
+    # retrieve phenopackets a chunk at a time, so only one chunk is held in memory while streaming
+    chunk_size = current_app.config["RECORD_STREAM_CHUNK_SIZE"]
+    handover_permission = has_download_data_permissions(g.permissions)
+    ordered_ids = sorted(ids)
+
+    for i in range(0, len(ordered_ids), chunk_size):
+        chunk_ids = ordered_ids[i : i + chunk_size]
+        handover = (await handover_for_ids(chunk_ids, project_id, dataset_id)) if handover_permission else {}
+        phenopackets_by_result_set = (await phenopackets_for_ids(chunk_ids, project_id, dataset_id)).get("results", {})
+        for r_id, results_this_id in phenopackets_by_result_set.items():
+            yield individuals_result_set(r_id, results_this_id.get("matches", []), handover.get(r_id, []))
+
+
+def individuals_result_set(r_id, results, handover):
+    results_count = len(results)
+    result = {
+        "id": r_id,
+        "setType": "individual",
+        "exists": results_count > 0,
+        "resultsCount": results_count,
+        "results": results,
+    }
+    if handover:
+        result["resultsHandovers"] = handover
+    return result
+
+
 # forbidden / unauthorized if no permissions
 @route_with_optional_project_id("/individuals/<id>", methods=["GET", "POST"])
 @requires_full_record_permissions
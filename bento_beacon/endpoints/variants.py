@@ -1,8 +1,25 @@
-from flask import Blueprint, g
+import asyncio
+from flask import Blueprint, current_app, g
 from ..authz.middleware import authz_middleware
-from ..utils.beacon_response import build_query_response, add_info_to_response, zero_count_response
-from ..utils.gohan_utils import query_gohan, gohan_total_variants_count, gohan_totals_by_sample_id
+from ..utils.beacon_response import (
+    build_query_response,
+    add_info_to_response,
+    add_no_results_censorship_message_to_response,
+    batch_summary,
+    beacon_batch_response,
+    response_granularity,
+)
+from ..utils.censorship import censored_count, get_censorship_threshold
+from ..utils.exceptions import APIException, InvalidQuery
+from ..utils.query_cache import cached_query_result, query_fingerprint
+from ..utils.gohan_utils import (
+    query_gohan,
+    gohan_total_variants_count,
+    gohan_total_variants_for_samples,
+    gohan_variants_count_for_samples,
+)
 from ..utils.search import biosample_id_search
+from ..constants import GRANULARITY_BOOLEAN, GRANULARITY_COUNT, GRANULARITY_RECORD
 
 variants = Blueprint("variants", __name__)
 # variant routes are not scoped, since gohan does not accept scoped queries.
@@ -24,40 +41,98 @@ async def get_variants():
         total_count = await gohan_total_variants_count()
         return await build_query_response(num_total_results=total_count)
 
-    #  collect biosample ids from all filters
-    sample_ids = []
+    async def variants_search():
+        #  collect biosample ids from all filters
+        sample_ids = []
 
+        if has_filters:
+            sample_ids = await biosample_id_search(
+                phenopacket_filters=phenopacket_filters,
+                experiment_filters=experiment_filters,
+                config_filters=config_filters,
+            )
+            if not sample_ids:
+                return 0
+
+        # finally, find relevant variants, depending on whether a variants query was made
+        if variants_query:
+            return await variants_query_count(variants_query, sample_ids if has_filters else None)
+
+        # filters only, so no query needed, just sum totals for these samples from the gohan overview
+        return await gohan_total_variants_for_samples(sample_ids)
+
+    # repeated queries reuse the count from a recent search
+    gohan_count = await cached_query_result(query_fingerprint("variants"), variants_search)
+    return await build_query_response(num_total_results=gohan_count)
+
+
+async def variants_query_count(variants_query, sample_ids=None) -> int:
+    # with sample ids (from filters), only calls for those samples are counted
+    if sample_ids is not None:
+        return await gohan_variants_count_for_samples(variants_query, sample_ids)
+
+    # boolean queries can stop searching as soon as there are enough results
+    granularity = GRANULARITY_BOOLEAN if response_granularity() == GRANULARITY_BOOLEAN else GRANULARITY_COUNT
+    return (await query_gohan(variants_query, granularity))["count"]
+
+
+def batch_error(e: APIException) -> dict:
+    return {"error": {"errorCode": e.status_code, "errorMessage": e.message}}
+
+
+# many variant queries in one request, e.g. for checking a panel of alleles
+# queries are given as a list in "requestParameters.g_variants", and all share the request's filters
+# validation, permissions, censorship settings and the filter search happen once, then queries run concurrently
+@variants.route("/g_variants/batch", methods=["POST"])
+@authz_middleware.deco_public_endpoint
+async def get_variants_batch():
+    variants_queries = g.beacon_query["variants_queries"]
+    phenopacket_filters = g.beacon_query["phenopacket_filters"]
+    experiment_filters = g.beacon_query["experiment_filters"]
+    config_filters = g.beacon_query["config_filters"]
+    has_filters = phenopacket_filters or experiment_filters or config_filters
+
+    max_queries = current_app.config["BATCH_VARIANT_QUERY_MAX_QUERIES"]
+    if not variants_queries:
+        raise InvalidQuery("batch variant query requires a list of queries in requestParameters.g_variants")
+    if len(variants_queries) > max_queries:
+        raise InvalidQuery(f"too many queries in batch, maximum of {max_queries} permitted")
+
+    granularity = response_granularity()
+    if granularity == GRANULARITY_RECORD:
+        raise InvalidQuery("record response not available for this entry type")
+
+    sample_ids = None
     if has_filters:
         sample_ids = await biosample_id_search(
             phenopacket_filters=phenopacket_filters,
             experiment_filters=experiment_filters,
             config_filters=config_filters,
         )
-        if not sample_ids:
-            return await zero_count_response()
 
-    # finally, find relevant variants, depending on whether a variants query was made
-    if variants_query:
-        # gohan search returns uppercase only
-        sample_ids = [id.upper() for id in sample_ids]
+    semaphore = asyncio.Semaphore(current_app.config["BATCH_VARIANT_QUERY_MAX_CONCURRENT"])
 
-        variant_results = await query_gohan(variants_query, "record", ids_only=False)
-        if has_filters:
-            variant_results_list = list(filter(lambda v: v.get("sample_id") in sample_ids, variant_results))
-            gohan_count = len(variant_results_list)
-        else:
-            gohan_count = len(variant_results)
-    else:
-        # gohan overview returns lowercase only
-        sample_ids = [id.lower() for id in sample_ids]
-
-        variant_totals = await gohan_totals_by_sample_id()
-        if has_filters:
-            gohan_count = sum(variant_totals.get(id) for id in sample_ids if id in variant_totals)
-        else:
-            gohan_count = sum(variant_totals.values())
+    async def query_summary(variants_query):
+        try:
+            if sample_ids is not None and not sample_ids:
+                count = 0
+            else:
+                async with semaphore:
+                    count = await cached_query_result(
+                        query_fingerprint("variants", variants_query=variants_query),
+                        lambda: variants_query_count(variants_query, sample_ids),
+                    )
+        except APIException as e:
+            # one bad query shouldn't sink the rest
+            return batch_error(e)
+        return batch_summary(await censored_count(count), granularity)
 
-    return await build_query_response(num_total_results=gohan_count)
+    summaries = await asyncio.gather(*map(query_summary, variants_queries))
+
+    if (await get_censorship_threshold()) > 0 and not all(s.get("exists", True) for s in summaries):
+        add_no_results_censorship_message_to_response()
+
+    return beacon_batch_response(summaries, granularity)
 
 
 # -------------------------------------------------------
@@ -1,6 +1,6 @@
 from flask import current_app, request, Blueprint
 from ..utils.exceptions import NotFoundException, APIException, NotImplemented
-from .utils.network_beacons import init_network_service_registry
+from .utils.network_beacons import network_registry
 
 network = Blueprint("network", __name__, url_prefix="/network")
 
@@ -19,14 +19,13 @@ async def beacon_network():
     if not network_config:
         raise APIException("can't find beacon network config")
 
-    results = await init_network_service_registry(network_config, current_app.config, current_app.logger)
-    return results
+    return await network_registry.network_details(current_app.config, current_app.logger)
 
 
 # returns 404 if endpoint missing
 @network.route("/beacons/<beacon_id>/<endpoint>", methods=["GET", "POST"])
 async def query(beacon_id, endpoint):
-    beacon = current_app.config["NETWORK_BEACONS"].get(beacon_id)
+    beacon = await network_registry.beacon(beacon_id, current_app.config, current_app.logger)
 
     if not beacon:
         raise NotFoundException(message=f"no beacon found with id {beacon_id}")
@@ -1,10 +1,12 @@
 import asyncio
 import aiohttp
+import os
 from json import JSONDecodeError
 from abc import ABC, abstractmethod
 from flask import current_app
 from .filters import get_filters_dict, get_intersection_of_filtering_terms, get_union_of_filtering_terms, flatten
-from ...utils.http import tcp_connector
+from ...utils.cache import AsyncCache
+from ...utils.http import io_loop, on_io_loop, upstream_session
 from ...utils.exceptions import APIException
 from ...utils.censorship import set_censorship
 from ...endpoints.biosamples import get_biosamples
@@ -128,21 +130,22 @@ class NetworkBeacon(NetworkNode):
         query = payload.get("requestParameters", {}).get("g_variant")
         return bool(query)
 
+    @on_io_loop
     async def _network_beacon_call(self, method, url, payload=None):
         self.logger.info(f"Calling network url: {url}")
         timeout = self.request_timeout(payload)
 
         try:
-            async with aiohttp.ClientSession(connector=tcp_connector(self.app_config)) as s:
-                async with (
-                    s.get(url, timeout=timeout) if method == "GET" else s.post(url, timeout=timeout, json=payload)
-                ) as r:
-                    if not r.ok:
-                        status = r.status
-                        error_message = (await r.json()).get("error", {}).get("errorMessage")
-                        self.logger.error(f"failed network call to {url}: {error_message}")
-                        raise APIException(status_code=status, message=error_message)
-                    beacon_response = await r.json()
+            s = upstream_session("network")
+            async with (
+                s.get(url, timeout=timeout) if method == "GET" else s.post(url, timeout=timeout, json=payload)
+            ) as r:
+                if not r.ok:
+                    status = r.status
+                    error_message = (await r.json()).get("error", {}).get("errorMessage")
+                    self.logger.error(f"failed network call to {url}: {error_message}")
+                    raise APIException(status_code=status, message=error_message)
+                beacon_response = await r.json()
 
         except (JSONDecodeError, aiohttp.ContentTypeError) as e:
             msg = f"beacon network error calling url {url}: {e}"
@@ -159,42 +162,147 @@ class NetworkBeacon(NetworkNode):
         return await self._network_beacon_call("POST", url, payload)
 
 
+# -----------------------------------
+#       registry
 # -----------------------------------
 
+# Details of the other beacons in the network (service info, overview, filtering terms) are kept in memory and
+# refreshed in the background, each beacon on its own timer, so network calls don't wait on the slowest beacon.
+# A beacon that stops responding keeps its last good details until they run out (NETWORK_NODE_STALE_SECONDS).
+# The host beacon's own details depend on the caller's permissions, so those are still retrieved for each request.
 
-async def init_network_service_registry(network_config, app_config, logger):
-    network_beacons = network_config.get("beacons")
-    host_beacon_url = app_config["BEACON_BASE_URL"]
+# beacon api url -> NetworkBeacon, with details filled in
+network_node_cache = AsyncCache("network_nodes")
 
-    # instantiate skeleton beacon objects
-    beacons = []
-    for node_config in network_beacons.values():
-        if node_config.get("api_url") == host_beacon_url:
-            beacons.append(HostBeacon(node_config, app_config, logger))
-        else:
-            beacons.append(NetworkBeacon(node_config, app_config, logger))
 
-    # fill in service details and filtering terms for each beacon
-    beacon_calls = [b.retrieve_beacon_info() for b in beacons]
-    await asyncio.gather(*beacon_calls, return_exceptions=True)
+async def load_network_beacon(node_config, app_config, logger) -> NetworkBeacon:
+    beacon = NetworkBeacon(node_config, app_config, logger)
+    await beacon.retrieve_beacon_info()
+    return beacon
 
-    # filter out failed beacons
-    # could add extra handling for failed beacons in the future
-    responding_beacons = [b for b in beacons if b.id is not None]
 
-    # create network-wide filtering terms
-    network_filtering_terms = await get_network_filtering_terms(responding_beacons)
+def network_beacon_ttl(app_config):
+    # beacons that didn't identify themselves aren't kept, so they're tried again next time
+    return lambda beacon: app_config["NETWORK_REFRESH_INTERVAL_SECONDS"] if beacon.id is not None else 0
 
-    # save beacons as a dict by id
-    current_app.config["NETWORK_BEACONS"] = {b.id: b for b in responding_beacons}
 
-    results = {
-        "beacons": [b.node_info_to_json() for b in responding_beacons],
-        "filtersIntersection": network_filtering_terms.get("filtersIntersection"),
-        "filtersUnion": network_filtering_terms.get("filtersUnion"),
-    }
+class NetworkRegistry:
+    """
+    Beacons in the network, by id. Other beacons are served from network_node_cache, the host beacon is built as needed.
+    """
+
+    def __init__(self):
+        # pid of the process the background refreshes were started in, since they don't survive a fork
+        self._refreshing_pid = None
+        # other beacons' ids are only known from their own details, so remember which url each was found at
+        self._urls_by_id: dict[str, str] = {}
+
+    @staticmethod
+    def _is_host(node_config, app_config) -> bool:
+        return node_config.get("api_url") == app_config["BEACON_BASE_URL"]
+
+    async def remote_beacon(self, node_config, app_config, logger) -> NetworkBeacon:
+        self.ensure_refreshing(app_config, logger)
+        beacon = await network_node_cache.get_or_load(
+            node_config.get("api_url"),
+            lambda: load_network_beacon(node_config, app_config, logger),
+            ttl=network_beacon_ttl(app_config),
+            stale_ttl=app_config["NETWORK_NODE_STALE_SECONDS"],
+        )
+        self._remember_id(beacon)
+        return beacon
+
+    def _remember_id(self, beacon: NetworkBeacon) -> None:
+        if beacon.id is not None:
+            self._urls_by_id[beacon.id] = beacon.api_url
+
+    async def responding_beacons(self, app_config, logger) -> list[NetworkNode]:
+        async def node(node_config):
+            if self._is_host(node_config, app_config):
+                host = HostBeacon(node_config, app_config, logger)
+                await host.retrieve_beacon_info()
+                return host
+            return await self.remote_beacon(node_config, app_config, logger)
+
+        node_configs = app_config["NETWORK_CONFIG"].get("beacons", {}).values()
+        beacons = await asyncio.gather(*map(node, node_configs), return_exceptions=True)
+
+        # filter out failed beacons
+        # could add extra handling for failed beacons in the future
+        return [b for b in beacons if isinstance(b, NetworkNode) and b.id is not None]
+
+    async def beacon(self, beacon_id, app_config, logger) -> NetworkNode | None:
+        """
+        A single beacon to query, without waiting on any other beacon that's already known.
+        """
+        node_configs = app_config["NETWORK_CONFIG"].get("beacons", {}).values()
+
+        if beacon_id == app_config["BEACON_ID"]:
+            host_config = next((nc for nc in node_configs if self._is_host(nc, app_config)), None)
+            if host_config is None:
+                return None
+            # nothing else is needed to query it
+            host = HostBeacon(host_config, app_config, logger)
+            host.id = beacon_id
+            return host
+
+        remote_configs = [nc for nc in node_configs if not self._is_host(nc, app_config)]
+        url = self._urls_by_id.get(beacon_id)
+        if url is not None:
+            candidates = [nc for nc in remote_configs if nc.get("api_url") == url]
+        else:
+            # not seen yet, so it can only be one of the beacons that hasn't identified itself
+            known_urls = set(self._urls_by_id.values())
+            candidates = [nc for nc in remote_configs if nc.get("api_url") not in known_urls]
+
+        beacons = await asyncio.gather(
+            *(self.remote_beacon(nc, app_config, logger) for nc in candidates), return_exceptions=True
+        )
+        return next((b for b in beacons if isinstance(b, NetworkBeacon) and b.id == beacon_id), None)
+
+    async def network_details(self, app_config, logger) -> dict:
+        responding_beacons = await self.responding_beacons(app_config, logger)
+
+        # create network-wide filtering terms
+        network_filtering_terms = await get_network_filtering_terms(responding_beacons)
+
+        return {
+            "beacons": [b.node_info_to_json() for b in responding_beacons],
+            "filtersIntersection": network_filtering_terms.get("filtersIntersection"),
+            "filtersUnion": network_filtering_terms.get("filtersUnion"),
+        }
 
-    return results
+    # -----------------------------------
+    #       background refresh
+    # -----------------------------------
+
+    def ensure_refreshing(self, app_config, logger) -> None:
+        """
+        Start refreshing other beacons in the background, if enabled and not already running in this process.
+        """
+        if not app_config["NETWORK_BACKGROUND_REFRESH"] or self._refreshing_pid == os.getpid():
+            return
+        self._refreshing_pid = os.getpid()
+        for node_config in app_config["NETWORK_CONFIG"].get("beacons", {}).values():
+            if not self._is_host(node_config, app_config):
+                asyncio.run_coroutine_threadsafe(self._refresh_forever(node_config, app_config, logger), io_loop())
+
+    async def _refresh_forever(self, node_config, app_config, logger) -> None:
+        url = node_config.get("api_url")
+        while True:
+            try:
+                beacon = await load_network_beacon(node_config, app_config, logger)
+                network_node_cache.set(
+                    url, beacon, ttl=network_beacon_ttl(app_config), stale_ttl=app_config["NETWORK_NODE_STALE_SECONDS"]
+                )
+                self._remember_id(beacon)
+            except Exception as e:
+                # last good details are kept
+                logger.error(f"failed to refresh network beacon {url}: {e}")
+            await asyncio.sleep(app_config["NETWORK_REFRESH_INTERVAL_SECONDS"])
+
+
+network_registry = NetworkRegistry()
 
 
 async def get_network_filtering_terms(beacons: list[NetworkNode]):
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+from flask import current_app
+
+# Optional bloom filter over every (assembly, chromosome, position, ref, alt) in gohan, used to answer
+# "does this allele exist" queries that miss without calling gohan at all.
+#
+# The filter lives in a single file: a small json header followed by the bit array, which is memory-mapped, so
+# lookups touch only a few pages and the filter is shared between worker processes through the page cache.
+# It's built and updated only by the "build-allele-index" cli command (see gohan_utils.py), which should be run again
+# after ingests. Until then, assemblies with new variants aren't answered from the index.
+
+MAGIC = b"BEACON-ALLELE-INDEX\n"
+HEADER_SIZE = 4096
+
+
+def bloom_parameters(capacity: int, false_positive_rate: float) -> tuple[int, int]:
+    """
+    Number of bits and hashes for a filter holding up to capacity items at the given false positive rate.
+    """
+    capacity = max(capacity, 1)
+    num_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+    num_bits = max(8, (num_bits + 7) // 8 * 8)
+    num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+    return num_bits, num_hashes
+
+
+def allele_key(assembly_id: str, chromosome: str, position: int, ref: str, alt: str) -> bytes:
+    # position is one-based, as in gohan
+    return f"{assembly_id}|{chromosome.removeprefix('chr')}|{int(position)}|{ref.upper()}|{alt.upper()}".encode()
+
+
+class AlleleIndex:
+    """
+    Memory-mapped bloom filter of alleles. A negative answer from might_contain() is definite, a positive one may be
+    a false positive. Variant counts for each assembly are saved with the filter when it's built, and answers are only
+    trusted for assemblies whose counts haven't changed since (see covers()).
+    """
+
+    def __init__(self, path: str, header: dict, f, bits: mmap.mmap):
+        self.path = path
+        self.capacity: int = header["capacity"]
+        self.num_bits: int = header["num_bits"]
+        self.num_hashes: int = header["num_hashes"]
+        self.assembly_counts: dict[str, int] = header["assembly_counts"]
+        self._file = f
+        self._bits = bits
+
+    @classmethod
+    def open(cls, path: str, writable: bool = False) -> "AlleleIndex":
+        f = open(path, "r+b" if writable else "rb")
+        try:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an allele index")
+            header = json.loads(f.read(HEADER_SIZE - len(MAGIC)).rstrip(b" "))
+            bits = mmap.mmap(
+                f.fileno(),
+                header["num_bits"] // 8,
+                access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ,
+                offset=HEADER_SIZE,
+            )
+        except Exception:
+            f.close()
+            raise
+        return cls(path, header, f, bits)
+
+    @classmethod
+    def create(cls, path: str, capacity: int, false_positive_rate: float) -> "AlleleIndex":
+        """
+        New, empty, writable index, in a temporary file that replaces path once saved.
+        """
+        num_bits, num_hashes = bloom_parameters(capacity, false_positive_rate)
+        header = {"capacity": capacity, "num_bits": num_bits, "num_hashes": num_hashes, "assembly_counts": {}}
+        building_path = f"{path}.building"
+        with open(building_path, "wb") as f:
+            f.write(_encode_header(header))
+            f.truncate(HEADER_SIZE + num_bits // 8)
+        index = cls.open(building_path, writable=True)
+        index.path = path
+        return index
+
+    def close(self) -> None:
+        self._bits.close()
+        self._file.close()
+
+    def _positions(self, key: bytes):
+        # double hashing, from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: bytes) -> None:
+        bits = self._bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def might_contain(self, key: bytes) -> bool:
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def covers(self, assembly_id: str, variants_count: int | None) -> bool:
+        # true if every variant for this assembly was indexed, i.e. nothing was ingested since it was built
+        return variants_count is not None and self.assembly_counts.get(assembly_id) == variants_count
+
+    def save(self, assembly_counts: dict[str, int]) -> None:
+        """
+        Write out the bits, then the header with the counts they're now complete for.
+        """
+        self._bits.flush()
+        self.assembly_counts = assembly_counts
+        header = {
+            "capacity": self.capacity,
+            "num_bits": self.num_bits,
+            "num_hashes": self.num_hashes,
+            "assembly_counts": assembly_counts,
+        }
+        os.pwrite(self._file.fileno(), _encode_header(header), 0)
+        os.fsync(self._file.fileno())
+        if self._file.name != self.path:
+            os.replace(self._file.name, self.path)
+
+
+def _encode_header(header: dict) -> bytes:
+    encoded = MAGIC + json.dumps(header, separators=(",", ":")).encode()
+    if len(encoded) > HEADER_SIZE:
+        raise ValueError("too many assemblies for allele index header")
+    return encoded.ljust(HEADER_SIZE, b" ")
+
+
+# path -> (file identity, index)
+_allele_indexes: dict[str, tuple[tuple, AlleleIndex]] = {}
+
+
+def allele_index() -> AlleleIndex | None:
+    """
+    The configured allele index, or None if there isn't one (or it hasn't been built yet).
+    Reopened whenever the file is rebuilt or updated.
+    """
+    path = current_app.config["ALLELE_INDEX_PATH"]
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+    opened = _allele_indexes.get(path)
+    if opened is not None and opened[0] == identity:
+        return opened[1]
+
+    try:
+        index = AlleleIndex.open(path)
+    except (OSError, ValueError) as e:
+        current_app.logger.warning(f"could not open allele index {path}: {e}")
+        return None
+    if opened is not None:
+        opened[1].close()
+    _allele_indexes[path] = (identity, index)
+    return index
@@ -1,6 +1,12 @@
+import functools
+import json
 import jsonschema
+import pathlib
 from flask import current_app, request, g
 from bento_lib.auth.resources import build_resource
+from referencing import Registry, Resource
+from referencing.jsonschema import DRAFT202012
+from urllib.parse import urljoin, urlsplit
 from .exceptions import InvalidQuery, PermissionsException
 from .scope import MESSAGE_FOR_TOO_MANY_DATASETS
 from ..authz.middleware import evaluate_permissions_on_resource
@@ -25,6 +31,10 @@ def expand_path(id):
 
 def parse_query_params(request_data):
     variants_query = request_data.get("requestParameters", {}).get("g_variant") or {}
+    # batch variant queries only
+    variants_queries = request_data.get("requestParameters", {}).get("g_variants") or []
+    if not isinstance(variants_queries, list) or not all(isinstance(q, dict) for q in variants_queries):
+        raise InvalidQuery("g_variants must be a list of variant queries")
     filters = request_data.get("filters") or []
     phenopacket_filters = list(filter(lambda f: f["id"].startswith("phenopacket."), filters))
     experiment_filters = list(filter(lambda f: f["id"].startswith("experiment."), filters))
@@ -66,6 +76,7 @@ def parse_query_params(request_data):
     )
     return {
         "variants_query": variants_query,
+        "variants_queries": variants_queries,
         "phenopacket_filters": phenopacket_filters,
         "experiment_filters": experiment_filters,
         "config_filters": config_filters,
@@ -92,7 +103,7 @@ def package_get_params(params):
         "variantType",
     )
     variant_params_arrays = ("start", "end")
-    pagination_params = ("skip", "limit")
+    pagination_params = ("skip", "limit", "currentPage")
 
     meta = {}
     if ["apiVersion"] in param_keys:
@@ -170,23 +181,33 @@ def validate_request():
         # GET params are not bound by the beaconRequestBody schema
         return
 
-    # file path resolver for local json schema
-    resolver = jsonschema.validators.RefResolver(
-        base_uri=current_app.config["BEACON_REQUEST_SPEC_URI"],
-        referrer=True,
-    )
+    validator = request_body_validator(current_app.config["BEACON_REQUEST_SPEC_URI"])
+    error = jsonschema.exceptions.best_match(validator.iter_errors(request_args))
+    if error is not None:
+        raise InvalidQuery(message=f"Bad Request: {error.message}")
 
-    try:
-        jsonschema.validate(
-            instance=request_args,
-            schema={"$ref": "beaconRequestBody.json"},
-            resolver=resolver,
-        )
+    return
 
-    except jsonschema.exceptions.ValidationError as e:
-        raise InvalidQuery(message=f"Bad Request: {e.message}")
 
-    return
+@functools.cache
+def request_body_validator(request_spec_uri: str) -> jsonschema.protocols.Validator:
+    """
+    Validator for beaconRequestBody, built once (at app startup) and reused for every request.
+    Every schema in the beacon spec's json directory is read into an in-memory registry up front,
+    so $refs between schema files are resolved without touching the disk again.
+    """
+    # request schemas refer to siblings in "common" etc., so load everything under the spec's json directory
+    spec_json_dir = pathlib.Path(urlsplit(request_spec_uri).path).parent
+    resources = []
+    for schema_path in sorted(spec_json_dir.rglob("*.json")):
+        with open(schema_path) as f:
+            resource = Resource.from_contents(json.load(f), default_specification=DRAFT202012)
+        resources.append((schema_path.as_uri(), resource))
+    registry = Registry().with_resources(resources).crawl()
+
+    schema = {"$ref": urljoin(request_spec_uri, "beaconRequestBody.json")}
+    validator_class = jsonschema.validators.validator_for(schema)
+    return validator_class(schema, registry=registry)
 
 
 def summary_stats_requested():
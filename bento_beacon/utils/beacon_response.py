@@ -1,4 +1,7 @@
-from flask import current_app, g, request, url_for
+import json
+from contextvars import ContextVar
+from flask import Response, current_app, g, request, stream_with_context, url_for
+from .http import iterate_on_io_loop
 from .katsu_utils import search_summary_statistics, overview_statistics
 from .censorship import (
     get_censorship_threshold,
@@ -7,8 +10,11 @@ from .censorship import (
     MESSAGE_FOR_CENSORED_QUERY_WITH_NO_RESULTS,
 )
 from ..authz.utils import has_count_permissions
-from .exceptions import InvalidQuery
-from ..constants import GRANULARITY_BOOLEAN, GRANULARITY_COUNT, GRANULARITY_RECORD
+from .exceptions import APIException, InvalidQuery
+from ..constants import GRANULARITY_BOOLEAN, GRANULARITY_COUNT, GRANULARITY_RECORD, NDJSON_MIMETYPE
+
+# messages added by a single task (and anything it starts), as well as to the response, see query_cache.py
+collected_messages: ContextVar[list | None] = ContextVar("collected_messages", default=None)
 
 
 def init_response_data():
@@ -25,6 +31,13 @@ def add_message(message_obj):
     messages = g.response_info.get("messages", [])
     messages.append(message_obj)
     g.response_info["messages"] = messages
+    if (collected := collected_messages.get()) is not None:
+        collected.append(message_obj)
+
+
+def add_pagination_to_response(page_tokens):
+    # opaque tokens for "pagination.currentPage" in the next request
+    g.response_info["pagination"] = page_tokens
 
 
 def add_no_results_censorship_message_to_response():
@@ -120,7 +133,12 @@ def response_granularity():
     return requested_g if requested_g else default_g
 
 
-async def build_query_response(ids=None, num_total_results=None, full_record_handler=None):
+def stream_requested():
+    # either ask for ndjson directly, or set "bento.stream" in the request body
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE or bool(g.request_data.get("bento", {}).get("stream"))
+
+
+async def build_query_response(ids=None, num_total_results=None, full_record_handler=None, stream_handler=None):
     granularity = response_granularity()
     count = len(ids) if num_total_results is None else num_total_results
     returned_count = await censored_count(count)
@@ -134,6 +152,8 @@ async def build_query_response(ids=None, num_total_results=None, full_record_han
         if full_record_handler is None:
             # user asked for full response where it doesn't exist yet, e.g. in variants
             raise InvalidQuery("record response not available for this entry type")
+        if stream_handler is not None and stream_requested():
+            return beacon_result_set_stream(stream_handler(ids), len(ids))
         result_sets, num_total_results = await full_record_handler(ids)
         return beacon_result_set_response(result_sets, num_total_results)
 
@@ -210,6 +230,27 @@ def beacon_count_response(count):
     return r
 
 
+# response from /g_variants/batch, with a summary for each query, in the order they were given
+# summaries are censored individually, and failed queries have an error in place of a summary
+def beacon_batch_response(batch_summaries, granularity):
+    returned_schemas = []
+    r = {
+        "meta": response_meta(returned_schemas, granularity),
+        "responseSummary": {"exists": any(s.get("exists") for s in batch_summaries)},
+        "batchResponses": batch_summaries,
+    }
+    info = response_info()
+    if info:
+        r["info"] = info
+    return r
+
+
+def batch_summary(count, granularity):
+    if granularity == GRANULARITY_BOOLEAN:
+        return {"exists": count > 0}
+    return {"numTotalResults": count, "exists": count > 0}
+
+
 # response from /cohorts and /datasets
 # general info only, currently uncensored, could add filtering by permissions if necessary
 def beacon_collections_response(results):
@@ -228,7 +269,7 @@ def beacon_collections_response(results):
 
 # uncensored full record response, typically for authorized users
 # any fine-grained permissions are handled before we get here
-# TODO: pagination (ideally after katsu search gets paginated)
+# paginated by the full record handler, which adds page tokens to "info"
 def beacon_result_set_response(result_sets, num_total_results):
     returned_schemas = schemas_this_query()
     returned_granularity = "record"
@@ -243,6 +284,37 @@ def beacon_result_set_response(result_sets, num_total_results):
     return r
 
 
+# streamed version of the above, as newline-delimited json
+# the first line has "meta", "responseSummary" and "info", each line after that is a partial result set:
+#   {"resultSet": {"id": ..., "setType": ..., "resultsCount": ..., "results": [...]}}
+# large result sets are split across several lines, clients merge them by id
+# results are streamed as they are retrieved, so streamed responses are not paginated
+def beacon_result_set_stream(result_sets, num_total_results):
+    returned_schemas = schemas_this_query()
+    returned_granularity = "record"
+    header = {
+        "meta": response_meta(returned_schemas, returned_granularity),
+        "responseSummary": {"numTotalResults": num_total_results, "exists": num_total_results > 0},
+    }
+    info = response_info()
+    if info:
+        header["info"] = info
+
+    def ndjson_lines():
+        yield json.dumps(header) + "\n"
+        try:
+            for result_set in iterate_on_io_loop(result_sets):
+                yield json.dumps({"resultSet": result_set}) + "\n"
+        except Exception as e:
+            # status and headers are already sent, so the best we can do is end the stream with an error line
+            current_app.logger.error(f"Error while streaming response: {repr(e)}")
+            message = e.message if isinstance(e, APIException) else "Server Error"
+            status_code = e.status_code if isinstance(e, APIException) else 500
+            yield json.dumps({"error": {"errorCode": status_code, "errorMessage": message}}) + "\n"
+
+    return Response(stream_with_context(ndjson_lines()), mimetype=NDJSON_MIMETYPE)
+
+
 def beacon_error_response(message, status_code):
     return {"meta": response_meta([], None), "error": {"errorCode": status_code, "errorMessage": message}}
 
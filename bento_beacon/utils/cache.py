@@ -0,0 +1,165 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from .http import on_io_loop
+
+# every cache instance, so they can be cleared together
+_caches: list["AsyncCache"] = []
+
+TTL = float | Callable[[Any], float] | None
+Limit = int | Callable[[], int] | None
+
+
+class AsyncCache:
+    """
+    In-memory cache for values retrieved from upstream services.
+    Entries expire after a time-to-live (fixed, or computed from the value), and the cache can optionally be bounded
+    in size, evicting least-recently-used entries first.
+    With a weigher, the cache can also be bounded by the total weight of its values (e.g. a number of records), with
+    max_weight given directly or as a function, for limits read from app config when the cache is used.
+
+    With stale_ttl, expired entries are kept for that much longer: get_or_load() returns the stale value immediately
+    and refreshes it in the background, so callers don't wait on slow upstream calls for data that rarely changes.
+
+    Loading is single-flight: concurrent misses for the same key share one call to the loader.
+    Loads run on the io loop (see utils/http.py), so in-flight loads are shared across requests and threads.
+    Loader exceptions are passed to every waiting caller and are never cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: TTL = None,
+        max_size: int | None = None,
+        stale_ttl: float = 0,
+        weigher: Callable[[Any], int] | None = None,
+        max_weight: Limit = None,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stale_ttl = stale_ttl
+        self.weigher = weigher
+        self.max_weight = max_weight
+        # key -> (expiry, end of stale period, value)
+        self._entries: OrderedDict[Hashable, tuple[float, float, Any]] = OrderedDict()
+        # key -> weight, for weighed caches
+        self._weights: dict[Hashable, int] = {}
+        self._total_weight = 0
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+        # bumped on invalidation, so that loads started before an invalidation don't store stale values
+        self._generation = 0
+
+        _caches.append(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable, default=None):
+        entry = self._live_entry(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return default
+        return entry[2]
+
+    def _live_entry(self, key: Hashable) -> tuple[float, float, Any] | None:
+        # entry for the key, possibly stale, or None if there's no entry or it's past its stale period
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: Hashable, value, ttl: TTL = None, stale_ttl: float | None = None) -> None:
+        seconds = self._ttl_seconds(value, self.ttl if ttl is None else ttl)
+        if seconds is None or seconds <= 0:
+            # zero ttl means "don't cache"
+            return
+        max_weight = self.max_weight() if callable(self.max_weight) else self.max_weight
+        weight = self.weigher(value) if self.weigher is not None else 0
+        if max_weight is not None and weight > max_weight:
+            # would evict everything else and still not fit
+            return
+
+        self._remove(key)
+        expiry = time.monotonic() + seconds
+        self._entries[key] = (expiry, expiry + (self.stale_ttl if stale_ttl is None else stale_ttl), value)
+        if self.weigher is not None:
+            self._weights[key] = weight
+            self._total_weight += weight
+
+        while (self.max_size is not None and len(self._entries) > self.max_size) or (
+            max_weight is not None and self._total_weight > max_weight
+        ):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        self._total_weight -= self._weights.pop(key, 0)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """
+        Drop a single entry, or everything if no key is given.
+        """
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+            self._weights.clear()
+            self._total_weight = 0
+        else:
+            self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """
+        Drop every entry whose key matches the predicate.
+        """
+        self._generation += 1
+        for key in [k for k in self._entries if predicate(k)]:
+            self._remove(key)
+
+    @on_io_loop
+    async def get_or_load(
+        self, key: Hashable, loader: Callable[[], Awaitable], ttl: TTL = None, stale_ttl: float | None = None
+    ):
+        entry = self._live_entry(key)
+        if entry is not None:
+            expiry, _, value = entry
+            if expiry <= time.monotonic():
+                # stale, refresh in the background (errors are dropped, the stale value is kept until it runs out)
+                self._start_load(key, loader, ttl, stale_ttl)
+            return value
+
+        # shield so that a cancelled caller doesn't cancel the load for everyone else
+        return await asyncio.shield(self._start_load(key, loader, ttl, stale_ttl))
+
+    def _start_load(self, key, loader, ttl, stale_ttl) -> asyncio.Future:
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(self._load(key, loader, ttl, stale_ttl))
+            # mark errors as retrieved, in case every caller was cancelled before the load finished
+            in_flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._in_flight[key] = in_flight
+        return in_flight
+
+    async def _load(self, key, loader, ttl, stale_ttl):
+        generation = self._generation
+        try:
+            value = await loader()
+            if generation == self._generation:
+                self.set(key, value, ttl, stale_ttl)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+
+    @staticmethod
+    def _ttl_seconds(value, ttl: TTL) -> float | None:
+        return ttl(value) if callable(ttl) else ttl
+
+
+def clear_all_caches() -> None:
+    for c in _caches:
+        c.invalidate()
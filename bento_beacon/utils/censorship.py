@@ -1,10 +1,14 @@
 from flask import current_app, g, request
+from .cache import AsyncCache
 from .exceptions import APIException, InvalidQuery
 from .katsu_utils import katsu_censorship_settings
-from ..authz.utils import has_full_record_permissions
+from ..authz.utils import has_full_record_permissions, permissions_tier
 
 MESSAGE_FOR_CENSORED_QUERY_WITH_NO_RESULTS = "No results. Either none were found, or the query produced results numbering at or below the threshold for censorship."
 
+# katsu rules keyed by (project_id, dataset_id, permissions tier), since katsu answers according to forwarded auth
+censorship_settings_cache = AsyncCache("censorship_settings")
+
 
 async def set_censorship() -> None:
     reject_query_if_not_permitted()
@@ -18,15 +22,25 @@ async def censorship_settings_lookup() -> tuple[int, int]:
     query = g.beacon_query if g.beacon_query else {}
     project_id = view_args.get("project_id")
     dataset_id = query.get("dataset_id")
+    tier = permissions_tier(g.get("permissions", {}))
+
+    max_filters, count_threshold = await censorship_settings_cache.get_or_load(
+        (project_id, dataset_id, tier),
+        lambda: load_censorship_settings(project_id, dataset_id),
+        ttl=current_app.config["CENSORSHIP_SETTINGS_CACHE_TTL_SECONDS"],
+    )
+
+    current_app.logger.info(f"censorship for this request: {max_filters}, count_threshold: {count_threshold}")
+    return max_filters, count_threshold
+
 
+async def load_censorship_settings(project_id, dataset_id) -> tuple[int, int]:
     max_filters, count_threshold = await katsu_censorship_settings(project_id=project_id, dataset_id=dataset_id)
     if max_filters is None or count_threshold is None:
         raise APIException(
             message="error reading censorship settings from katsu: "
             + f"project_id: {project_id}, dataset_id: {dataset_id}, max_filters: {max_filters}, count_threshold: {count_threshold}"
         )
-
-    current_app.logger.info(f"censorship for this request: {max_filters}, count_threshold: {count_threshold}")
     return max_filters, count_threshold
 
 
@@ -0,0 +1,30 @@
+import json
+from typing import Awaitable, Callable
+from .cache import AsyncCache
+
+# Identical upstream requests made at the same time (e.g. a burst of beacon UI page loads after a deploy or a cache
+# expiry) share a single call. Nothing is kept once the call finishes, this is only the single-flight part of
+# AsyncCache, with a zero ttl.
+#
+# Requests are identical if they have the same method, url, params, body and authorization header, so responses are
+# never shared between callers with different credentials.
+
+_in_flight_requests = AsyncCache("in_flight_requests", ttl=0)
+
+
+def request_key(method: str, url: str, headers: dict, params=None, body=None) -> tuple:
+    return (
+        method,
+        url,
+        headers.get("Authorization"),
+        json.dumps(params, sort_keys=True, default=str),
+        json.dumps(body, sort_keys=True, default=str),
+    )
+
+
+async def coalesced_request(key: tuple, call: Callable[[], Awaitable]):
+    """
+    Result of call(), shared with any identical request already in flight.
+    The shared response is the same object for every caller, so callers must not modify it.
+    """
+    return await _in_flight_requests.get_or_load(key, call)
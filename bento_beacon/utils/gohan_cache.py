@@ -0,0 +1,111 @@
+import bisect
+from typing import Awaitable, Callable, Hashable
+from flask import current_app
+from .cache import AsyncCache
+
+# Cached gohan search and count results.
+# Results are keyed by the exact query, and search results that include full call records are also indexed by region,
+# so that a later search or count over any part of a cached window is answered from it, without calling gohan.
+# The cache is bounded by the total number of calls held, as well as by entries.
+
+BOUNDS_PARAMS = ("lowerBound", "upperBound")
+IDS_ONLY_PARAM = "getSampleIdsOnly"
+
+# (url, query) -> gohan results
+gohan_result_cache = AsyncCache(
+    "gohan_results",
+    max_size=1000,
+    weigher=lambda results: len(results.get("calls") or []),
+    max_weight=lambda: current_app.config["GOHAN_RESULT_CACHE_MAX_TOTAL_CALLS"],
+)
+
+
+class RegionIndex:
+    """
+    Windows of cached gohan call records for each region (assembly, chromosome and any other query params),
+    sorted by lower bound. Only keys are kept here, values live in the result cache and may be evicted from it.
+    """
+
+    def __init__(self):
+        self._windows: dict[Hashable, list[tuple[int, int, Hashable]]] = {}
+
+    def add(self, region_key: Hashable, lower_bound: int, upper_bound: int, cache_key: Hashable) -> None:
+        # drop windows that are no longer cached while we're here
+        windows = [w for w in self._windows.get(region_key, []) if gohan_result_cache.get(w[2]) is not None]
+        window = (lower_bound, upper_bound, cache_key)
+        if window not in windows:
+            windows.insert(bisect.bisect_left(windows, (lower_bound,)), window)
+        self._windows[region_key] = windows
+
+    def calls_in_range(self, region_key: Hashable, lower_bound: int, upper_bound: int) -> list[dict] | None:
+        """
+        Calls from any cached window that covers [lower_bound, upper_bound], or None if no window does.
+        """
+        windows = self._windows.get(region_key, [])
+        # only windows starting at or before lower_bound can cover the range, check the latest-starting first
+        for i in reversed(range(bisect.bisect_right(windows, (lower_bound, float("inf"))))):
+            window_lower, window_upper, cache_key = windows[i]
+            if window_upper < upper_bound:
+                continue
+            results = gohan_result_cache.get(cache_key)
+            if results is None:
+                # evicted or expired
+                del windows[i]
+                continue
+            return [c for c in results.get("calls") or [] if lower_bound <= int(c.get("pos")) <= upper_bound]
+        return None
+
+    def clear(self) -> None:
+        self._windows.clear()
+
+
+region_index = RegionIndex()
+
+
+def invalidate_gohan_results() -> None:
+    # e.g. after new variants are ingested
+    gohan_result_cache.invalidate()
+    region_index.clear()
+
+
+def _params_key(gohan_args: dict, exclude=()) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in gohan_args.items() if k not in exclude))
+
+
+def _truthy_param(value) -> bool:
+    return str(value).lower() == "true"
+
+
+async def cached_gohan_results(url: str, gohan_args: dict, load: Callable[[], Awaitable[dict | None]]) -> dict | None:
+    c = current_app.config
+    cache_key = (url, _params_key(gohan_args))
+    cached = gohan_result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    has_bounds = all(gohan_args.get(b) is not None for b in BOUNDS_PARAMS)
+    region_key = (c["GOHAN_BASE_URL"], _params_key(gohan_args, exclude=(*BOUNDS_PARAMS, IDS_ONLY_PARAM)))
+    lower_bound, upper_bound = (int(gohan_args[b]) for b in BOUNDS_PARAMS) if has_bounds else (None, None)
+
+    # answer from a cached window of records covering this one
+    if has_bounds and (calls := region_index.calls_in_range(region_key, lower_bound, upper_bound)) is not None:
+        if url.endswith(c["GOHAN_COUNT_ENDPOINT"]):
+            return {"count": len(calls)}
+        if _truthy_param(gohan_args.get(IDS_ONLY_PARAM)):
+            return {"calls": [{"sample_id": call.get("sample_id")} for call in calls]}
+        return {"calls": calls}
+
+    def results_ttl(results):
+        # very large results would crowd out everything else, don't keep them
+        if results is None or len(results.get("calls") or []) > c["GOHAN_RESULT_CACHE_MAX_CALLS"]:
+            return 0
+        return c["GOHAN_RESULT_CACHE_TTL_SECONDS"]
+
+    results = await gohan_result_cache.get_or_load(cache_key, load, ttl=results_ttl)
+
+    # full records can answer later queries over any part of this window
+    is_record_search = url.endswith(c["GOHAN_SEARCH_ENDPOINT"]) and not _truthy_param(gohan_args.get(IDS_ONLY_PARAM))
+    if has_bounds and is_record_search and gohan_result_cache.get(cache_key) is not None:
+        region_index.add(region_key, lower_bound, upper_bound, cache_key)
+
+    return results
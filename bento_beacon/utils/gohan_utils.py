@@ -1,12 +1,28 @@
 import aiohttp
+import asyncio
+import os
+import re
+from array import array
+from collections import Counter
+from contextlib import aclosing
 from flask import current_app
-from .http import tcp_connector, aiohttp_params
+from .allele_index import AlleleIndex, allele_index, allele_key
+from .cache import AsyncCache
+from .coalesce import coalesced_request, request_key
+from .censorship import get_censorship_threshold
+from .gohan_cache import cached_gohan_results, invalidate_gohan_results
+from .http import aiohttp_params, on_io_loop, upstream_session
 from ..authz.access import create_access_header_or_fall_back
 from .exceptions import APIException, InvalidQuery, NotImplemented
-from .reference import gene_position_lookup
+from .query_cache import invalidate_query_results
+from .reference import gene_position_lookup, reference_contigs
 
 GOHAN_ERROR_MESSAGE = "error calling gohan variants service"
 
+# granularity for internal queries that only need the number of matching calls for each sample,
+# answered with a tiled scan of sample ids (a Counter), never a list of every call
+SAMPLE_COUNTS = "sample_counts"
+
 # -------------------------------------------------------
 #       query mapping
 # -------------------------------------------------------
@@ -21,9 +37,6 @@ gohan_beacon_variant_query_mapped_fields = {
 # throw warning if beacon query includes these terms
 # TODO: remove any lines for features that get implemented
 beacon_variant_query_not_implemented_params = [
-    "variantType",
-    "variantMinLength",
-    "variantMaxLength",
     "mateName",
     "aminoacidChange",
     "genomicAlleleShortForm",
@@ -52,7 +65,16 @@ def beacon_to_gohan_generic_mapping(obj):
 
 # TODO: INS issues, see notes
 def zero_to_one(start, end=None):
-    return int(start) + 1 if end is None else (int(start) + 1, end)
+    start, end = query_positions(start, end)
+    return start + 1 if end is None else (start + 1, end)
+
+
+def query_positions(*positions):
+    # query values are only checked here, as they're translated for gohan
+    try:
+        return tuple(None if p is None else int(p) for p in positions)
+    except (ValueError, TypeError):
+        raise InvalidQuery(message="variant query 'start' and 'end' positions must be integers")
 
 
 # -------------------------------------------------------
@@ -67,6 +89,9 @@ async def query_gohan(beacon_args, granularity, ids_only=False):
     end = beacon_args.get("end")
     geneId = beacon_args.get("geneId")
 
+    if not isinstance(start, (list, type(None))) or not isinstance(end, (list, type(None))):
+        raise InvalidQuery(message="variant query 'start' and 'end' must be lists of positions")
+
     numStart = len(start) if start is not None else 0
     numEnd = len(end) if end is not None else 0
 
@@ -113,7 +138,13 @@ async def sequence_query_to_gohan(beacon_args, granularity, ids_only):
     gohan_args["upperBound"] = gohan_args["lowerBound"]
     gohan_args["getSampleIdsOnly"] = ids_only
 
-    return await generic_gohan_query(gohan_args, granularity, ids_only)
+    # most of these queries are misses, which the allele index can answer without calling gohan
+    if await allele_not_in_gohan(gohan_args):
+        if granularity == SAMPLE_COUNTS:
+            return Counter()
+        return [] if ids_only or granularity == "record" else {"count": 0}
+
+    return await generic_gohan_query(gohan_args, granularity, ids_only, variant_call_filter(beacon_args))
 
 
 # optional params
@@ -125,14 +156,29 @@ async def range_query_to_gohan(beacon_args, granularity, ids_only):
     gohan_args = beacon_to_gohan_generic_mapping(beacon_args)
     gohan_args["lowerBound"], gohan_args["upperBound"] = zero_to_one(beacon_args["start"][0], beacon_args["end"][0])
     gohan_args["getSampleIdsOnly"] = ids_only
-    return await generic_gohan_query(gohan_args, granularity, ids_only)
+    return await generic_gohan_query(gohan_args, granularity, ids_only, variant_call_filter(beacon_args))
 
 
 async def bracket_query_to_gohan(beacon_args, granularity, ids_only):
     current_app.logger.debug("BRACKET QUERY")
-    # TODO
-    # either implement here by filtering full results, or implement directly in gohan
-    raise NotImplemented(message="variant bracket query not implemented")
+    gohan_args = beacon_to_gohan_generic_mapping(beacon_args)
+    start_min, start_max, end_min, end_max = query_positions(*beacon_args["start"], *beacon_args["end"])
+    if start_min >= start_max or end_min >= end_max:
+        raise InvalidQuery(message="bracket query 'start' and 'end' must each be [min, max] with min < max")
+
+    # gohan matches on variant start only, so search the start bracket and filter variant ends in beacon
+    # brackets are zero-based and half-open, gohan positions are one-based
+    gohan_args["lowerBound"], gohan_args["upperBound"] = zero_to_one(start_min, start_max)
+
+    variant_filter = variant_call_filter(beacon_args)
+
+    def in_brackets(call):
+        start = call_start(call)
+        end = call_end(call)
+        in_range = start_min <= start < start_max and end_min <= end < end_max
+        return in_range and (variant_filter is None or variant_filter(call))
+
+    return await filtered_gohan_query(gohan_args, granularity, ids_only, in_brackets)
 
 
 async def geneId_query_to_gohan(beacon_args, granularity, ids_only):
@@ -143,13 +189,12 @@ async def geneId_query_to_gohan(beacon_args, granularity, ids_only):
     # query all assemblies present in gohan if not specified
     assemblies = [assembly_from_query] if assembly_from_query is not None else await gohan_assemblies()
     gohan_args = beacon_to_gohan_generic_mapping(beacon_args)
+    variant_filter = variant_call_filter(beacon_args)
 
-    gohan_results = []
-    # TODO: async
-    for assembly in assemblies:
+    async def query_assembly(assembly):
         gene_info = await gene_position_lookup(gene_id, assembly)
         if not gene_info:
-            continue
+            return None
 
         gohan_args_this_query = {
             **gohan_args,
@@ -159,13 +204,34 @@ async def geneId_query_to_gohan(beacon_args, granularity, ids_only):
             "upperBound": gene_info.get("end"),
             "getSampleIdsOnly": ids_only,
         }
+        return await generic_gohan_query(gohan_args_this_query, granularity, ids_only, variant_filter)
+
+    # assemblies are independent, so look up the gene and query gohan for all of them at once
+    results = await asyncio.gather(*(query_assembly(assembly) for assembly in assemblies))
+    return merge_gohan_results([r for r in results if r is not None], granularity, ids_only)
 
-        gohan_results.extend(await generic_gohan_query(gohan_args_this_query, granularity, ids_only))
 
-    return gohan_results
+def merge_gohan_results(results, granularity, ids_only):
+    # ids and records are lists, counts are {"count": n}
+    if granularity == SAMPLE_COUNTS:
+        return sum(results, Counter())
+    if ids_only or granularity == "record":
+        return [r for result in results for r in (result or [])]
+    return {"count": sum(result.get("count") or 0 for result in results)}
 
 
-async def generic_gohan_query(gohan_args, granularity, ids_only):
+async def generic_gohan_query(gohan_args, granularity, ids_only, call_filter=None):
+    if granularity == SAMPLE_COUNTS:
+        return await gohan_range_scan(gohan_args, call_filter=call_filter)
+
+    if call_filter is not None:
+        return await filtered_gohan_query(gohan_args, granularity, ids_only, call_filter)
+
+    # wide windows can time out in a single gohan call, so they are split into tiles searched concurrently
+    # (full records are still fetched in one call, but record queries for sample ids only are tiled too)
+    if (granularity != "record" or ids_only) and is_wide_gohan_query(gohan_args):
+        return await tiled_gohan_query(gohan_args, granularity, ids_only)
+
     if ids_only:
         return await gohan_ids_only_query(gohan_args, granularity)
 
@@ -181,6 +247,36 @@ async def generic_gohan_query(gohan_args, granularity, ids_only):
     return {"count": count}
 
 
+async def filtered_gohan_query(gohan_args, granularity, ids_only, call_filter):
+    # gohan can't apply these filters itself, so scan its results and filter in beacon
+    if granularity == "record" and not ids_only:
+        raise NotImplemented(message="full record variant queries with beacon-side filters not implemented")
+
+    stop_after = (await get_censorship_threshold()) if granularity == "boolean" else None
+    matches = await gohan_range_scan(gohan_args, call_filter=call_filter, stop_after=stop_after)
+    if ids_only:
+        return list(matches.elements())
+    return {"count": matches.total()}
+
+
+async def tiled_gohan_query(gohan_args, granularity, ids_only):
+    if ids_only:
+        return list((await gohan_range_scan(gohan_args)).elements())
+
+    stop_after = (await get_censorship_threshold()) if granularity == "boolean" else None
+    return {"count": await gohan_tiled_count(gohan_args, stop_after=stop_after)}
+
+
+async def gohan_variants_count_for_samples(beacon_args, sample_ids) -> int:
+    """
+    Count calls matching a variant query that belong to any of the given samples.
+    Gohan is searched in tiles for sample ids only, keeping just the number of calls for each sample.
+    """
+    # gohan search returns uppercase only
+    calls_by_sample_id = await query_gohan(beacon_args, SAMPLE_COUNTS)
+    return sum(calls_by_sample_id[sample_id] for sample_id in {id.upper() for id in sample_ids})
+
+
 async def gohan_ids_only_query(gohan_args, granularity):
     config = current_app.config
     query_url = config["GOHAN_BASE_URL"] + config["GOHAN_SEARCH_ENDPOINT"]
@@ -195,22 +291,24 @@ def unpackage_sample_ids(results):
 
 
 async def gohan_results(url, gohan_args):
-    response = await gohan_network_call(url, gohan_args)
-    results_array = response.get("results")
-    results = results_array[0] if results_array else None
-    return results
+    async def load():
+        response = await gohan_network_call(url, gohan_args)
+        results_array = response.get("results")
+        return results_array[0] if results_array else None
+
+    return await cached_gohan_results(url, gohan_args, load)
 
 
+@on_io_loop
 async def gohan_network_call(url, gohan_args):
     c = current_app.config
-    try:
-        async with aiohttp.ClientSession(connector=tcp_connector(c)) as s:
-            async with s.get(
-                url,
-                headers=await create_access_header_or_fall_back(),
-                timeout=c["GOHAN_TIMEOUT"],
-                params=aiohttp_params(gohan_args),
-            ) as r:
+    headers = await create_access_header_or_fall_back()
+    params = aiohttp_params(gohan_args)
+
+    async def get():
+        try:
+            s = upstream_session("gohan")
+            async with s.get(url, headers=headers, timeout=c["GOHAN_TIMEOUT"], params=params) as r:
 
                 # handle gohan errors or any bad responses
                 if not r.ok:
@@ -219,11 +317,13 @@ async def gohan_network_call(url, gohan_args):
 
                 gohan_response = await r.json()
 
-    except aiohttp.ClientError as e:
-        current_app.logger.error(f"gohan error: {e}")
-        raise APIException(message=GOHAN_ERROR_MESSAGE)
+        except aiohttp.ClientError as e:
+            current_app.logger.error(f"gohan error: {e}")
+            raise APIException(message=GOHAN_ERROR_MESSAGE)
+
+        return gohan_response
 
-    return gohan_response
+    return await coalesced_request(request_key("GET", url, headers, params=params), get)
 
 
 # currently used internally only
@@ -234,27 +334,295 @@ async def gohan_full_record_query(gohan_args):
     return response.get("calls")
 
 
-async def gohan_overview():
+# -------------------------------------------------------
+#       range scans
+# -------------------------------------------------------
+
+
+# gohan call positions are one-based
+def call_start(call) -> int:
+    return int(call.get("pos")) - 1
+
+
+def call_bases(bases) -> str:
+    # gohan gives ref and alt as lists of alleles
+    if isinstance(bases, list):
+        return bases[0] if bases else ""
+    return bases or ""
+
+
+def call_info_value(call, info_id: str):
+    # gohan gives info fields as a list of {"id": ..., "value": ...}
+    info = call.get("info") or []
+    if isinstance(info, dict):
+        value = info.get(info_id)
+    else:
+        value = next((i.get("value") for i in info if i.get("id") == info_id), None)
+    return call_bases(value) if isinstance(value, list) else value
+
+
+def call_end(call) -> int:
+    """
+    Zero-based, exclusive end of a call.
+    Symbolic alleles (e.g. <DEL>) don't spell out the bases they cover, so their span comes from END or SVLEN,
+    sequence alleles cover their ref bases.
+    """
+    start = call_start(call)
+    ref, alt = call_bases(call.get("ref")), call_bases(call.get("alt"))
+    try:
+        # END is one-based and inclusive, i.e. already a zero-based exclusive end
+        if (end := call_info_value(call, "END")) not in (None, ""):
+            return int(end)
+        sv_length = call_info_value(call, "SVLEN")
+        if alt.startswith("<") and sv_length not in (None, "") and "INS" not in call_variant_types(ref, alt):
+            # the reference base before the variant, then the bases it covers
+            return start + 1 + abs(int(sv_length))
+    except ValueError:
+        pass
+    return start + len(ref)
+
+
+# variantType, variantMinLength and variantMaxLength aren't supported by gohan, so are applied to gohan results here.
+# Types and lengths are worked out from ref and alt: lengths are the number of bases substituted (snvs, mnvs) or
+# inserted / deleted (indels). Symbolic alleles like <DEL> have a type but no known length.
+
+
+def call_variant_types(ref: str, alt: str) -> set[str]:
+    if alt.startswith("<") and alt.endswith(">"):
+        return {alt[1:-1].split(":")[0]}
+    if "[" in alt or "]" in alt:
+        return {"BND"}
+    if len(ref) == len(alt):
+        return {"SNV", "SNP"} if len(ref) == 1 else {"MNV", "MNP"}
+    return {"INS" if len(alt) > len(ref) else "DEL", "INDEL"}
+
+
+def call_variant_length(ref: str, alt: str) -> int | None:
+    if alt.startswith("<") or "[" in alt or "]" in alt:
+        return None
+    return len(ref) if len(ref) == len(alt) else abs(len(alt) - len(ref))
+
+
+def variant_call_filter(beacon_args):
+    """
+    Filter for gohan calls matching any variantType, variantMinLength and variantMaxLength in the query,
+    or None if there are none.
+    """
+    variant_type = beacon_args.get("variantType")
+    min_length = beacon_args.get("variantMinLength")
+    max_length = beacon_args.get("variantMaxLength")
+    if variant_type is None and min_length is None and max_length is None:
+        return None
+
+    try:
+        min_length = int(min_length) if min_length is not None else None
+        max_length = int(max_length) if max_length is not None else None
+    except ValueError:
+        raise InvalidQuery(message="variantMinLength and variantMaxLength must be integers")
+    variant_type = variant_type.upper() if variant_type is not None else None
+
+    def matches(call):
+        ref, alt = call_bases(call.get("ref")), call_bases(call.get("alt"))
+        if variant_type is not None and variant_type not in call_variant_types(ref, alt):
+            return False
+        if min_length is None and max_length is None:
+            return True
+        length = call_variant_length(ref, alt)
+        if length is None:
+            return False
+        return (min_length is None or length >= min_length) and (max_length is None or length <= max_length)
+
+    return matches
+
+
+def gohan_tiles(lower_bound: int, upper_bound: int, tile_size: int, whole_tiles=False) -> list[tuple[int, int]]:
+    """
+    Split an inclusive, one-based [lower, upper] window into inclusive tiles.
+    Tiles are aligned to multiples of tile_size, so that overlapping queries share tiles (and cached results).
+    Tiles at either end are trimmed to the window unless whole_tiles is set.
+    """
+    first_tile_start = (lower_bound - 1) // tile_size * tile_size + 1
+    tiles = [(lo, lo + tile_size - 1) for lo in range(first_tile_start, upper_bound + 1, tile_size)]
+    if whole_tiles:
+        return tiles
+    return [(max(lo, lower_bound), min(hi, upper_bound)) for lo, hi in tiles]
+
+
+async def gohan_tile_results(gohan_args, search_tile, whole_tiles=False):
+    """
+    Split the [lowerBound, upperBound] window into tiles and run search_tile(tile_args) for each, a few at a time,
+    yielding each result as soon as it arrives. Closing the generator early cancels any searches still running.
+    """
+    c = current_app.config
+    lower_bound, upper_bound = int(gohan_args["lowerBound"]), int(gohan_args["upperBound"])
+    tiles = gohan_tiles(lower_bound, upper_bound, c["GOHAN_RANGE_TILE_SIZE"], whole_tiles)
+    semaphore = asyncio.Semaphore(c["GOHAN_MAX_CONCURRENT_REQUESTS"])
+
+    async def bounded_search(lower_bound, upper_bound):
+        async with semaphore:
+            return await search_tile({**gohan_args, "lowerBound": lower_bound, "upperBound": upper_bound})
+
+    tasks = [asyncio.ensure_future(bounded_search(lo, hi)) for lo, hi in tiles]
+    try:
+        for next_tile in asyncio.as_completed(tasks):
+            yield await next_tile
+    finally:
+        # stopped early or failed, don't leave searches running
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def gohan_range_scan(gohan_args, call_filter=None, stop_after=None) -> Counter:
+    """
+    Search gohan over [lowerBound, upperBound] in tiles, filtering each tile's calls as it arrives.
+    Returns the number of matching calls for each sample id. Results for the whole range are never collected, only
+    per-sample counts are kept as tiles arrive, though tiles may also be kept in the gohan result cache, which is
+    bounded by GOHAN_RESULT_CACHE_MAX_TOTAL_CALLS (see gohan_cache.py).
+    With stop_after, the scan stops as soon as more than that many calls match (e.g. for boolean queries).
+    """
+    c = current_app.config
+    query_url = c["GOHAN_BASE_URL"] + c["GOHAN_SEARCH_ENDPOINT"]
+
+    # sample ids are enough if nothing needs to be filtered
+    ids_only = call_filter is None
+
+    # full records for wide scans are searched in whole tiles, which are more likely to be reused from the cache,
+    # then trimmed to the window here
+    whole_tiles = not ids_only and is_wide_gohan_query(gohan_args)
+    lower_bound, upper_bound = int(gohan_args["lowerBound"]), int(gohan_args["upperBound"])
+
+    def matches_query(call):
+        if whole_tiles and not lower_bound <= int(call.get("pos")) <= upper_bound:
+            return False
+        return call_filter is None or call_filter(call)
+
+    async def search_tile(tile_args):
+        results = await gohan_results(query_url, {**tile_args, "getSampleIdsOnly": ids_only})
+        return (results.get("calls") or []) if results else []
+
+    matches = Counter()
+    async with aclosing(gohan_tile_results(gohan_args, search_tile, whole_tiles)) as tile_results:
+        async for calls in tile_results:
+            matches.update(call.get("sample_id") for call in calls if matches_query(call))
+            if stop_after is not None and matches.total() > stop_after:
+                break
+
+    return matches
+
+
+async def gohan_tiled_count(gohan_args, stop_after=None) -> int:
+    """
+    Count calls over [lowerBound, upperBound] with one gohan count per tile, summed as they arrive.
+    With stop_after, counting stops as soon as the total is past it.
+    """
+    c = current_app.config
+    query_url = c["GOHAN_BASE_URL"] + c["GOHAN_COUNT_ENDPOINT"]
+
+    async def count_tile(tile_args):
+        results = await gohan_results(query_url, tile_args)
+        return (results.get("count") or 0) if results else 0
+
+    count = 0
+    async with aclosing(gohan_tile_results(gohan_args, count_tile)) as tile_counts:
+        async for tile_count in tile_counts:
+            count += tile_count
+            if stop_after is not None and count > stop_after:
+                break
+
+    return count
+
+
+def is_wide_gohan_query(gohan_args) -> bool:
+    lower_bound, upper_bound = gohan_args.get("lowerBound"), gohan_args.get("upperBound")
+    if lower_bound is None or upper_bound is None:
+        return False
+    return int(upper_bound) - int(lower_bound) + 1 > current_app.config["GOHAN_RANGE_TILE_SIZE"]
+
+
+# -------------------------------------------------------
+#       overview
+# -------------------------------------------------------
+
+
+class GohanOverview:
+    """
+    Snapshot of the gohan variants overview.
+    Per-sample variant totals are kept in a compact array with an index by sample id, so totals for a set of
+    samples are a run of index lookups rather than a scan over the full overview.
+    """
+
+    def __init__(self, overview: dict):
+        totals_by_sample_id = overview.get("sampleIDs") or {}
+        self.sample_positions = {sample_id: i for i, sample_id in enumerate(totals_by_sample_id)}
+        self.sample_totals = array("q", totals_by_sample_id.values())
+        self.total_variants = sum(self.sample_totals)
+        self.counts_by_assembly_id = overview.get("assemblyIDs") or {}
+
+    def total_for_samples(self, sample_ids) -> int:
+        positions = self.sample_positions
+        return sum(map(self.sample_totals.__getitem__, {positions[s] for s in sample_ids if s in positions}))
+
+
+# one shared snapshot, refreshed in the background once it expires
+gohan_overview_cache = AsyncCache("gohan_overview")
+
+# total from the most recently loaded overview, to notice new data
+_last_overview_total: dict[str, int] = {}
+
+# overview for checks that can't use a stale snapshot, only kept for a few seconds
+gohan_recent_overview_cache = AsyncCache("gohan_recent_overview")
+
+
+async def gohan_overview() -> GohanOverview:
+    c = current_app.config
+    return await gohan_overview_cache.get_or_load(
+        "overview",
+        load_gohan_overview,
+        ttl=c["GOHAN_OVERVIEW_CACHE_TTL_SECONDS"],
+        stale_ttl=c["GOHAN_OVERVIEW_STALE_SECONDS"],
+    )
+
+
+async def recent_gohan_overview() -> GohanOverview:
+    """
+    Overview no older than GOHAN_RECENT_OVERVIEW_MAX_AGE_SECONDS, never served stale.
+    """
+    return await gohan_recent_overview_cache.get_or_load(
+        "overview", load_gohan_overview, ttl=current_app.config["GOHAN_RECENT_OVERVIEW_MAX_AGE_SECONDS"]
+    )
+
+
+async def load_gohan_overview() -> GohanOverview:
     config = current_app.config
     url = config["GOHAN_BASE_URL"] + config["GOHAN_OVERVIEW_ENDPOINT"]
-    return await gohan_network_call(url, {})
+    overview = GohanOverview(await gohan_network_call(url, {}))
 
+    # variant totals change when gohan ingests new data, so cached search and query results are out of date
+    previous_total = _last_overview_total.get("total_variants")
+    if previous_total is not None and previous_total != overview.total_variants:
+        invalidate_gohan_results()
+        invalidate_query_results()
+    _last_overview_total["total_variants"] = overview.total_variants
 
-async def gohan_totals_by_sample_id():
-    return (await gohan_overview()).get("sampleIDs", {})
+    return overview
 
 
 async def gohan_total_variants_count():
-    totals_by_id = await gohan_totals_by_sample_id()
-    return sum(totals_by_id.values())
+    return (await gohan_overview()).total_variants
+
+
+async def gohan_total_variants_for_samples(sample_ids):
+    # gohan overview sample ids are lowercase only
+    return (await gohan_overview()).total_for_samples(id.lower() for id in sample_ids)
 
 
 async def gohan_counts_by_assembly_id():
-    return (await gohan_overview()).get("assemblyIDs", {})
+    return dict((await gohan_overview()).counts_by_assembly_id)
 
 
 async def gohan_assemblies():
-    return list((await gohan_overview()).get("assemblyIDs", {}).keys())
+    return list((await gohan_overview()).counts_by_assembly_id)
 
 
 # only runs if "useGohan" true
@@ -336,6 +704,7 @@ async def gohan_counts_for_overview():
 # For all four, the main options are:
 # (1) do standard gohan search and filter results in beacon according to params, OR
 # (2) implement missing feature in gohan
+# variantMinLength, variantMaxLength and variantType use option 1, see variant_call_filter()
 
 
 # --------------------------------------------
@@ -356,6 +725,7 @@ async def gohan_counts_for_overview():
 # brackets are not supported by gohan, so as above, the main options are to:
 # (1) implement in gohan
 # (2) filter results in beacon accordingly (for large ranges, this can be a lot of data, so call gohan paginated)
+# option 2 is implemented in bracket_query_to_gohan(), as a tiled scan over the start bracket
 
 # mapping, assuming option 2:
 
@@ -382,3 +752,123 @@ async def gohan_counts_for_overview():
 #     variantMaxLength
 
 # obviously assemblyId may be useful here as well as an optional parameter, although docs ignore it
+
+
+# -------------------------------------------------------
+#       allele index
+# -------------------------------------------------------
+
+# wildcards and symbolic alleles can't be looked up exactly
+PLAIN_BASES = re.compile(r"[ACGTacgt]+")
+
+
+async def allele_not_in_gohan(gohan_args) -> bool:
+    """
+    True only if the allele index shows that gohan definitely has no variant matching this sequence query.
+    """
+    index = allele_index()
+    if index is None:
+        return False
+
+    assembly_id, ref, alt = gohan_args.get("assemblyId"), gohan_args.get("reference"), gohan_args.get("alternative")
+    if not (assembly_id and PLAIN_BASES.fullmatch(str(ref)) and PLAIN_BASES.fullmatch(str(alt))):
+        return False
+
+    # anything ingested after the index was built isn't in it, and the shared overview may be minutes out of date
+    if not index.covers(assembly_id, (await recent_gohan_overview()).counts_by_assembly_id.get(assembly_id)):
+        return False
+
+    return not index.might_contain(
+        allele_key(assembly_id, gohan_args.get("chromosome", ""), gohan_args["lowerBound"], ref, alt)
+    )
+
+
+@on_io_loop
+async def build_allele_index(full=False) -> dict[str, int]:
+    """
+    Build the allele index by searching gohan over every contig of every assembly with variants.
+    Nothing rebuilds the index automatically: run this again after ingests (e.g. on a schedule), until then
+    assemblies with new variants are searched in gohan as if there were no index.
+    Bloom filters only ever gain entries, so on update only assemblies whose variant counts have changed are
+    searched again, and added to the existing filter. A full rebuild starts over from an empty filter, and is also
+    done when there are more variants than the filter was sized for.
+    Assemblies are only recorded as indexed if every call in gohan's overview count was seen, e.g. calls on contigs
+    the reference service doesn't list would otherwise be reported as definitely absent.
+    Returns the variant counts for each assembly indexed.
+    """
+    c = current_app.config
+    path = c["ALLELE_INDEX_PATH"]
+    if not path:
+        raise APIException(message="no allele index configured, set BEACON_ALLELE_INDEX_PATH")
+
+    # counts are taken before searching, so that anything ingested during the build leaves the index out of date
+    counts = (await load_gohan_overview()).counts_by_assembly_id
+    needed_capacity = sum(counts.values())
+
+    index = None
+    if not full and os.path.exists(path):
+        index = AlleleIndex.open(path, writable=True)
+        if index.capacity < needed_capacity:
+            index.close()
+            index = None
+    if index is None:
+        # leave room for future ingests
+        index = AlleleIndex.create(path, 2 * needed_capacity, c["ALLELE_INDEX_FALSE_POSITIVE_RATE"])
+
+    try:
+        indexed = {a: n for a, n in index.assembly_counts.items() if counts.get(a) == n}
+        for assembly_id, count in counts.items():
+            if assembly_id in indexed:
+                continue
+            if count and (num_indexed := await index_assembly_alleles(index, assembly_id)) != count:
+                current_app.logger.warning(
+                    f"indexed {num_indexed} of {count} calls for {assembly_id}, leaving it out of allele index"
+                )
+                continue
+            indexed[assembly_id] = count
+        index.save(indexed)
+    finally:
+        index.close()
+
+    return indexed
+
+
+async def index_assembly_alleles(index: AlleleIndex, assembly_id: str) -> int:
+    """
+    Add alleles from every call on the reference service's contigs for this assembly, returning the number of calls.
+    """
+    config = current_app.config
+    query_url = config["GOHAN_BASE_URL"] + config["GOHAN_SEARCH_ENDPOINT"]
+
+    try:
+        contigs = await reference_contigs(assembly_id)
+    except APIException:
+        current_app.logger.warning(f"no contigs found for {assembly_id}, skipping it in allele index")
+        return 0
+
+    async def search_tile(tile_args):
+        # straight to gohan, these results aren't worth caching
+        response = await gohan_network_call(query_url, tile_args)
+        results_array = response.get("results")
+        return (results_array[0].get("calls") or []) if results_array else []
+
+    num_calls = 0
+    for contig in contigs:
+        chromosome = contig["name"].removeprefix("chr")
+        contig_args = {
+            "assemblyId": assembly_id,
+            "chromosome": chromosome,
+            "lowerBound": 1,
+            "upperBound": contig["length"],
+            "getSampleIdsOnly": False,
+        }
+        async with aclosing(gohan_tile_results(contig_args, search_tile)) as tile_results:
+            async for calls in tile_results:
+                num_calls += len(calls)
+                for call in calls:
+                    ref = call_bases(call.get("ref"))
+                    alts = call.get("alt")
+                    for alt in alts if isinstance(alts, list) else [alts]:
+                        index.add(allele_key(assembly_id, chromosome, call.get("pos"), ref, alt or ""))
+
+    return num_calls
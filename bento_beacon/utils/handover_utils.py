@@ -1,18 +1,25 @@
 import aiohttp
+import asyncio
 from flask import current_app
 from urllib.parse import urlsplit, urlunsplit
+from .cache import AsyncCache
 from .katsu_utils import katsu_post
 from .exceptions import APIException
-from .http import tcp_connector
+from .http import on_io_loop, upstream_session
 from ..authz.headers import auth_header_from_request
 
 DRS_TIMEOUT_SECONDS = 10
 
+# filename -> download url
+# only users with download permissions are given handovers, so the same url can be shared between them
+drs_link_cache = AsyncCache("drs_links", max_size=10_000)
+
 
 def drs_url_components(c):
     return urlsplit(c["DRS_URL"])
 
 
+@on_io_loop
 async def drs_network_call(path, query):
     c = current_app.config
 
@@ -28,9 +35,9 @@ async def drs_network_call(path, query):
     )
 
     try:
-        async with aiohttp.ClientSession(connector=tcp_connector(c)) as s:
-            async with s.get(url, headers=auth_header_from_request(), timeout=DRS_TIMEOUT_SECONDS) as r:
-                drs_response = await r.json()
+        s = upstream_session("drs")
+        async with s.get(url, headers=auth_header_from_request(), timeout=DRS_TIMEOUT_SECONDS) as r:
+            drs_response = await r.json()
 
     # TODO
     # on handover errors, keep returning rest of results instead of throwing api exception
@@ -99,6 +106,29 @@ def vcf_handover_entry(url, note=None):
     return entry
 
 
+async def cached_drs_link_from_vcf_filename(filename):
+    ttl = current_app.config["DRS_LINK_CACHE_TTL_SECONDS"]
+    return await drs_link_cache.get_or_load(
+        filename,
+        lambda: drs_link_from_vcf_filename(filename),
+        # don't cache missing files, they may be ingested later
+        ttl=lambda url: ttl if url else 0,
+    )
+
+
+async def drs_links_for_filenames(filenames) -> dict[str, str | None]:
+    # resolve concurrently, but don't flood drs with hundreds of simultaneous searches
+    semaphore = asyncio.Semaphore(current_app.config["DRS_MAX_CONCURRENT_REQUESTS"])
+
+    async def link_for(f):
+        async with semaphore:
+            return await cached_drs_link_from_vcf_filename(f)
+
+    filenames = list(filenames)
+    links = await asyncio.gather(*(link_for(f) for f in filenames))
+    return dict(zip(filenames, links))
+
+
 async def handover_for_ids(ids, project_id, dataset_id):
     # ideally we would preserve the mapping between ids and links,
     # but this requires changes in katsu to do well
@@ -107,12 +137,11 @@ async def handover_for_ids(ids, project_id, dataset_id):
 
     files_for_results = await filenames_by_results_set(ids, project_id, dataset_id)
 
+    # files can appear in more than one results set, only look up each one once
+    unique_files = {f for files in files_for_results.values() for f in files}
+    links = await drs_links_for_filenames(unique_files)
+
     for results_set, files in files_for_results.items():
-        handovers_this_set = []
-        for f in files:
-            link = await drs_link_from_vcf_filename(f)
-            if link:
-                handovers_this_set.append(vcf_handover_entry(link))
-        handovers[results_set] = handovers_this_set
+        handovers[results_set] = [vcf_handover_entry(links[f]) for f in files if links.get(f)]
 
     return handovers
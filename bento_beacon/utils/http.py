@@ -1,10 +1,198 @@
+import asyncio
+import atexit
+import os
+import threading
 import aiohttp
+from functools import wraps
+
+# Upstream http calls all run on a single, process-wide "io loop" in a background thread.
+# aiohttp sessions and connectors are bound to the event loop they were created on, and flask's default async bridge
+# gives each request (and each before_request handler) its own short-lived loop, so pooled sessions can only be shared
+# across requests if they live somewhere else. Calls are handed off to the io loop with run_on_io_loop(), and the
+# caller's context (flask app, request, g) is carried along with them.
+#
+# The app also runs its async views and handlers directly on the io loop (see io_loop_to_sync() and app.py), so each
+# worker process has one persistent loop, shared by all of its request threads.
+
+UPSTREAM_SERVICES = ("authz", "katsu", "gohan", "drs", "reference", "network")
+
+# defaults used until init_http() is called with the flask config
+_http_config = {
+    "BENTO_DEBUG": False,
+    "HTTP_CONNECTION_LIMIT": 100,
+    "HTTP_CONNECTION_LIMIT_PER_HOST": 20,
+    "HTTP_DNS_CACHE_TTL_SECONDS": 300,
+    "HTTP_KEEPALIVE_TIMEOUT_SECONDS": 30,
+}
+
+_lock = threading.Lock()
+_io_loop: asyncio.AbstractEventLoop | None = None
+_io_thread: threading.Thread | None = None
+_sessions: dict[str, aiohttp.ClientSession] = {}
+
+
+def init_http(c) -> None:
+    """
+    Read connection pool settings from flask config, called once at app startup.
+    Sessions are created lazily on first use, so this is safe to call before gunicorn forks workers.
+    """
+    for key in _http_config:
+        _http_config[key] = c.get(key, _http_config[key])
 
 
 def tcp_connector(c):
-    return aiohttp.TCPConnector(ssl=not c["BENTO_DEBUG"])
+    return aiohttp.TCPConnector(
+        ssl=not c["BENTO_DEBUG"],
+        limit=c["HTTP_CONNECTION_LIMIT"],
+        limit_per_host=c["HTTP_CONNECTION_LIMIT_PER_HOST"],
+        ttl_dns_cache=c["HTTP_DNS_CACHE_TTL_SECONDS"],
+        keepalive_timeout=c["HTTP_KEEPALIVE_TIMEOUT_SECONDS"],
+    )
 
 
 # aiohttp refuses to encode bools
 def aiohttp_params(p):
     return {k: (str(v) if isinstance(v, bool) else v) for k, v in p.items()}
+
+
+# -------------------------------------------------------
+#       io loop
+# -------------------------------------------------------
+
+
+def io_loop() -> asyncio.AbstractEventLoop:
+    global _io_loop, _io_thread
+    with _lock:
+        if _io_loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="beacon-io-loop", daemon=True)
+            thread.start()
+            _io_loop, _io_thread = loop, thread
+        return _io_loop
+
+
+def running_on_io_loop() -> bool:
+    try:
+        return asyncio.get_running_loop() is _io_loop
+    except RuntimeError:
+        return False
+
+
+async def run_on_io_loop(coro):
+    if running_on_io_loop():
+        return await coro
+
+    # run_coroutine_threadsafe copies the calling context into the new task, so flask globals still work there.
+    # Cancelling the awaiting task also cancels the task on the io loop.
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, io_loop()))
+
+
+def io_loop_to_sync(func):
+    """
+    Sync wrapper for an async function that runs it on the io loop, blocking the calling thread until it is done.
+    Used in place of flask's default async bridge, which starts a new event loop for every call.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if running_on_io_loop():
+            raise RuntimeError("cannot block the io loop waiting for itself")
+        return asyncio.run_coroutine_threadsafe(func(*args, **kwargs), io_loop()).result()
+
+    return wrapper
+
+
+def on_io_loop(f):
+    """
+    Decorator for async functions that make upstream calls, so that they can use the pooled sessions.
+    Nested calls that are already on the io loop are awaited directly.
+    """
+
+    @wraps(f)
+    async def decorated_func(*args, **kwargs):
+        return await run_on_io_loop(f(*args, **kwargs))
+
+    return decorated_func
+
+
+def iterate_on_io_loop(agen):
+    """
+    Drive an async generator from synchronous code (e.g. a streamed flask response body), one item at a time.
+    Each step runs on the io loop, so memory use is bounded by a single item rather than the whole result.
+    """
+    loop = io_loop()
+
+    async def next_item():
+        return await agen.__anext__()
+
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(next_item(), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        # also runs if the client disconnects part way through
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+# -------------------------------------------------------
+#       pooled sessions
+# -------------------------------------------------------
+
+
+def upstream_session(service: str) -> aiohttp.ClientSession:
+    """
+    Long-lived session (with its own keep-alive connection pool) for one upstream service.
+    Only call this from the io loop, i.e. from inside a function decorated with @on_io_loop.
+    """
+    if service not in UPSTREAM_SERVICES:
+        raise ValueError(f"unknown upstream service {service}")
+
+    session = _sessions.get(service)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=tcp_connector(_http_config))
+        _sessions[service] = session
+    return session
+
+
+async def _close_upstream_sessions() -> None:
+    sessions = list(_sessions.values())
+    _sessions.clear()
+    for s in sessions:
+        await s.close()
+
+
+def shutdown_http(timeout: float = 5) -> None:
+    """
+    Close pooled sessions and stop the io loop. Registered with atexit, so it runs at app shutdown,
+    including when gunicorn stops a worker.
+    """
+    global _io_loop, _io_thread
+    with _lock:
+        loop, thread = _io_loop, _io_thread
+        _io_loop, _io_thread = None, None
+
+    if loop is None or not loop.is_running():
+        return
+
+    try:
+        asyncio.run_coroutine_threadsafe(_close_upstream_sessions(), loop).result(timeout=timeout)
+    except Exception:
+        # nothing useful to do with errors at shutdown
+        pass
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=timeout)
+
+
+def _reset_after_fork() -> None:
+    # the io thread does not survive a fork, and sessions belong to the parent's loop, so start over in the child
+    global _io_loop, _io_thread, _lock
+    _lock = threading.Lock()
+    _io_loop, _io_thread = None, None
+    _sessions.clear()
+
+
+atexit.register(shutdown_http)
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,13 +1,16 @@
 import aiohttp
-from flask import current_app
+from flask import current_app, g
 from functools import reduce
 from json import JSONDecodeError
 from urllib.parse import urlencode, urlsplit, urlunsplit
 
+from .cache import AsyncCache
+from .coalesce import coalesced_request, request_key
 from .exceptions import APIException, InvalidQuery, InvalidFilterError
-from .http import tcp_connector
+from .http import on_io_loop, upstream_session
 from typing import Literal
 from ..authz.access import create_access_header_or_fall_back
+from ..authz.utils import permissions_tier
 from ..authz.headers import auth_header_from_request
 
 RequiresAuthOptions = Literal["none", "forwarded", "full"]
@@ -55,6 +58,7 @@ async def katsu_filters_and_sample_ids_query(beacon_filters, datatype, sample_id
     return await katsu_filters_query(filters_copy, datatype, project_id=project_id, dataset_id=dataset_id)
 
 
+@on_io_loop
 async def katsu_post(payload, endpoint=None, project_id=None, dataset_id=None):
     c = current_app.config
 
@@ -70,28 +74,31 @@ async def katsu_post(payload, endpoint=None, project_id=None, dataset_id=None):
     url = c["KATSU_BASE_URL"] + endpoint + ("?" + urlencode(query_dict) if query_dict else "")
 
     current_app.logger.debug(f"calling katsu url {url}")
+    headers = await create_access_header_or_fall_back()
 
-    try:
-        async with aiohttp.ClientSession(connector=tcp_connector(c)) as s:
-            async with s.post(
-                url, headers=await create_access_header_or_fall_back(), timeout=c["KATSU_TIMEOUT"], json=payload
-            ) as r:
+    async def post():
+        try:
+            s = upstream_session("katsu")
+            async with s.post(url, headers=headers, timeout=c["KATSU_TIMEOUT"], json=payload) as r:
 
                 katsu_response = await r.json()
 
-    except (JSONDecodeError, aiohttp.ContentTypeError) as e:
-        # katsu html-formatted error responses caught here
-        # older requests library raised JSONDecodeError for unexpected html
-        # aiohttp uses ContentTypeError instead, and raises JSONDecodeError only for malformed json
-        current_app.logger.error(f"katsu error: error reading katsu response from POST {url}")
-        raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
-    if not r.ok:
-        current_app.logger.error(f"katsu error, status: {r.status}, message: {katsu_response.get('message')}")
-        raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
+        except (JSONDecodeError, aiohttp.ContentTypeError) as e:
+            # katsu html-formatted error responses caught here
+            # older requests library raised JSONDecodeError for unexpected html
+            # aiohttp uses ContentTypeError instead, and raises JSONDecodeError only for malformed json
+            current_app.logger.error(f"katsu error: error reading katsu response from POST {url}")
+            raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
+        if not r.ok:
+            current_app.logger.error(f"katsu error, status: {r.status}, message: {katsu_response.get('message')}")
+            raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
 
-    return katsu_response
+        return katsu_response
 
+    return await coalesced_request(request_key("POST", url, headers, body=payload), post)
 
+
+@on_io_loop
 async def katsu_get(
     endpoint,
     entity_id=None,
@@ -129,26 +136,30 @@ async def katsu_get(
         headers = auth_header_from_request()
     elif requires_auth == "full":
         headers = await create_access_header_or_fall_back()
-    try:
-        async with aiohttp.ClientSession(connector=tcp_connector(c)) as s:
+
+    async def get():
+        try:
+            s = upstream_session("katsu")
             async with s.get(query_url, headers=headers, timeout=timeout) as r:
                 katsu_response = await r.json()
 
-    except (JSONDecodeError, aiohttp.ContentTypeError) as e:
-        # katsu html-formatted error responses caught here
-        # older requests library raised JSONDecodeError for unexpected html
-        # aiohttp uses ContentTypeError instead, and raises JSONDecodeError only for malformed json
-        current_app.logger.error(f"katsu error: error reading katsu response from GET {query_url}")
-        raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
+        except (JSONDecodeError, aiohttp.ContentTypeError) as e:
+            # katsu html-formatted error responses caught here
+            # older requests library raised JSONDecodeError for unexpected html
+            # aiohttp uses ContentTypeError instead, and raises JSONDecodeError only for malformed json
+            current_app.logger.error(f"katsu error: error reading katsu response from GET {query_url}")
+            raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
 
-    if not r.ok:
-        if bad_filter := katsu_bad_discovery_field_or_value(katsu_response):
-            raise InvalidFilterError(bad_filter)
-        # else generic bad request response
-        current_app.logger.error(f"katsu error, status: {r.status}, message: {katsu_response.get('message')}")
-        raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
+        if not r.ok:
+            if bad_filter := katsu_bad_discovery_field_or_value(katsu_response):
+                raise InvalidFilterError(bad_filter)
+            # else generic bad request response
+            current_app.logger.error(f"katsu error, status: {r.status}, message: {katsu_response.get('message')}")
+            raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
 
-    return katsu_response
+        return katsu_response
+
+    return await coalesced_request(request_key("GET", query_url, headers), get)
 
 
 # -------------------------------------------------------
@@ -333,27 +344,59 @@ async def katsu_projects(project_id=None):
     )
 
 
-async def katsu_datasets(project_id=None):
-    # katsu /datasets endpoint not scoped, so call /projects and read from there
-    datasets = []
-    response = await katsu_projects(project_id=project_id)
+# -------------------------------------------------------
+#       projects and datasets catalogue
+# -------------------------------------------------------
+
+
+class KatsuCatalogue:
+    """
+    All katsu projects and their datasets, indexed by identifier.
+    """
+
+    def __init__(self, projects: list[dict]):
+        self.projects_by_id = {p["identifier"]: p for p in projects}
+        self.datasets_by_project = {p["identifier"]: p.get("datasets") or [] for p in projects}
+        self.datasets_by_id = {d["identifier"]: d for ds in self.datasets_by_project.values() for d in ds}
+
+    def datasets(self, project_id=None) -> list[dict]:
+        if project_id is None:
+            return list(self.datasets_by_id.values())
+        return self.datasets_by_project.get(project_id, [])
+
 
-    if project_id is not None:  # single project
-        datasets.extend(response.get("datasets", []))
-    else:  # multiple projects
-        projects = response.get("results", [])
-        for p in projects:
-            datasets.extend(p.get("datasets"))
+# projects are public and change rarely, so one catalogue is shared by all requests
+katsu_catalogue_cache = AsyncCache("katsu_catalogue")
 
-    return datasets
+
+async def katsu_catalogue() -> KatsuCatalogue:
+    c = current_app.config
+    return await katsu_catalogue_cache.get_or_load(
+        "catalogue",
+        load_katsu_catalogue,
+        ttl=c["KATSU_CATALOGUE_CACHE_TTL_SECONDS"],
+        stale_ttl=c["KATSU_CATALOGUE_STALE_SECONDS"],
+    )
+
+
+async def load_katsu_catalogue() -> KatsuCatalogue:
+    response = await katsu_projects()
+    projects = response.get("results")
+    if projects is None:
+        raise APIException(message=BEACON_ERROR_MESSAGE_FOR_KATSU_FAILURE)
+    return KatsuCatalogue(projects)
+
+
+async def katsu_datasets(project_id=None):
+    return (await katsu_catalogue()).datasets(project_id)
 
 
 async def katsu_dataset_by_id(id, project_id=None):
-    datasets = await katsu_datasets(project_id=project_id)
-    result = [d for d in datasets if d.get("identifier") == id]
-    if result:
-        return result[0]
-    return {}  # or return None?
+    catalogue = await katsu_catalogue()
+    dataset = catalogue.datasets_by_id.get(id)
+    if dataset is None or (project_id is not None and dataset not in catalogue.datasets(project_id)):
+        return {}  # or return None?
+    return dataset
 
 
 async def phenopackets_for_ids(ids, project_id, dataset_id):
@@ -377,7 +420,20 @@ async def search_summary_statistics(ids):
     return await katsu_post(payload, endpoint)
 
 
+# katsu overviews keyed by (project_id, dataset_id, permissions tier), since katsu censors according to forwarded auth
+overview_statistics_cache = AsyncCache("overview_statistics")
+
+
 async def overview_statistics(project_id=None, dataset_id=None):
+    c = current_app.config
+    return await overview_statistics_cache.get_or_load(
+        (project_id, dataset_id, permissions_tier(g.permissions)),
+        lambda: load_overview_statistics(project_id, dataset_id),
+        ttl=c["KATSU_OVERVIEW_CACHE_TTL_SECONDS"],
+    )
+
+
+async def load_overview_statistics(project_id=None, dataset_id=None):
     # call katsu for censored public overview
     stats = await katsu_get(
         current_app.config["KATSU_BEACON_SEARCH"],
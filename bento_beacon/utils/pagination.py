@@ -0,0 +1,103 @@
+import base64
+import json
+import secrets
+from flask import current_app, g, request
+from .beacon_response import response_granularity
+from .cache import AsyncCache
+from .exceptions import InvalidQuery
+from .query_cache import query_fingerprint
+from ..constants import GRANULARITY_RECORD
+
+# Record queries are paginated with opaque page tokens, passed back by clients in "pagination.currentPage".
+# The ordered list of matching ids is saved under a query id when the first page is served, so later pages
+# only retrieve their own records, without running the search again.
+# Tokens are bound to the query they were issued for, including its scope and the caller's permissions.
+
+# query id -> {"ids": [...], "fingerprint": ...}
+paginated_ids_cache = AsyncCache("paginated_ids", max_size=1000)
+
+
+def encode_page_token(query_id: str, skip: int, limit: int) -> str:
+    token = json.dumps({"q": query_id, "s": skip, "l": limit}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(token.encode()).decode()
+
+
+def decode_page_token(token: str | None) -> dict | None:
+    if not token:
+        return None
+    try:
+        page = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return {"q": str(page["q"]), "s": int(page["s"]), "l": int(page["l"])}
+    except (ValueError, TypeError, KeyError):
+        raise InvalidQuery("invalid pagination token")
+
+
+def requested_page() -> tuple[str | None, int, int]:
+    """
+    Returns (query id, skip, limit) for this request, from the page token if there is one.
+    """
+    pagination = g.request_data.get("pagination", {})
+    page = decode_page_token(pagination.get("currentPage"))
+    if page is not None:
+        return page["q"], page["s"], page["l"]
+
+    # GET params arrive as strings
+    try:
+        skip = int(pagination.get("skip", 0))
+        limit = int(pagination.get("limit", current_app.config["DEFAULT_PAGINATION_PAGE_SIZE"]))
+    except ValueError:
+        raise InvalidQuery("pagination skip and limit must be integers")
+    return None, max(skip, 0), limit
+
+
+def page_query_fingerprint() -> tuple:
+    view_args = request.view_args if request.view_args else {}
+    return query_fingerprint(request.blueprint, view_args.get("project_id"))
+
+
+def cached_ids_for_page_token() -> list | None:
+    """
+    Matching ids saved for the query this page belongs to, or None if this isn't a record query with a page token,
+    or the token has expired.
+    """
+    if response_granularity() != GRANULARITY_RECORD:
+        return None
+    query_id, _, _ = requested_page()
+    if query_id is None:
+        return None
+    saved = paginated_ids_cache.get(query_id)
+    if saved is None:
+        return None
+    if saved["fingerprint"] != page_query_fingerprint():
+        raise InvalidQuery("pagination token does not match this query")
+    return saved["ids"]
+
+
+def paginate_ids(ids) -> tuple[list, dict | None]:
+    """
+    Returns the ids for the requested page, along with page tokens for the response.
+    No tokens are given when all results fit in a single page.
+    """
+    query_id, skip, limit = requested_page()
+    ordered_ids = sorted(ids)
+
+    if limit <= 0 or (skip == 0 and len(ordered_ids) <= limit):
+        return ordered_ids, None
+
+    if query_id is None:
+        query_id = secrets.token_urlsafe(16)
+
+    # (re)save on every page, so that the ttl runs from the most recent page served
+    paginated_ids_cache.set(
+        query_id,
+        {"ids": ordered_ids, "fingerprint": page_query_fingerprint()},
+        ttl=current_app.config["PAGINATION_CACHE_TTL_SECONDS"],
+    )
+
+    page_tokens = {"currentPage": encode_page_token(query_id, skip, limit)}
+    if skip + limit < len(ordered_ids):
+        page_tokens["nextPage"] = encode_page_token(query_id, skip + limit, limit)
+    if skip > 0:
+        page_tokens["previousPage"] = encode_page_token(query_id, max(skip - limit, 0), limit)
+
+    return ordered_ids[skip : skip + limit], page_tokens
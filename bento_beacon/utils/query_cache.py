@@ -0,0 +1,86 @@
+from flask import current_app, g
+from typing import Any, Awaitable, Callable
+from .beacon_response import add_message, collected_messages, response_granularity
+from .cache import AsyncCache
+from ..authz.utils import permissions_tier
+
+# Results of discovery queries, keyed by a normalised fingerprint of the query, its scope, the requested granularity
+# and the caller's permissions.
+# Only raw results are kept (counts, or lists of matching ids), never responses, so censorship is always applied
+# afterwards, for the request being answered.
+# Katsu gives no signal when new data is ingested, so results are only refreshed once their (short) ttl runs out,
+# apart from new gohan data, which clears them all (see gohan_utils.py).
+
+# fingerprint -> (result, messages added to the response while it was found)
+query_result_cache = AsyncCache("query_results", max_size=10_000)
+
+
+def _normalised(value) -> Any:
+    # hashable and independent of key order, and of GET params arriving as strings
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalised(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalised(v) for v in value)
+    return str(value)
+
+
+def query_fingerprint(entry_type: str, project_id=None, variants_query=None) -> tuple:
+    """
+    Fingerprint for the query in this request, with an optional variants query in place of the request's own.
+    """
+    q = g.beacon_query
+    filters = (*q["phenopacket_filters"], *q["experiment_filters"], *q["config_filters"])
+    return (
+        entry_type,
+        project_id,
+        q["dataset_id"],
+        response_granularity(),
+        permissions_tier(g.permissions),
+        _normalised(q["variants_query"] if variants_query is None else variants_query),
+        tuple(sorted(_normalised(f) for f in filters)),
+    )
+
+
+async def cached_query_result(fingerprint: tuple, load: Callable[[], Awaitable]):
+    c = current_app.config
+    loaded_here = False
+
+    async def load_with_messages():
+        nonlocal loaded_here
+        loaded_here = True
+        # other loads may be adding to the same response at the same time (e.g. batch queries),
+        # so only messages from this load are kept with its result
+        messages = []
+        token = collected_messages.set(messages)
+        try:
+            result = await load()
+        finally:
+            collected_messages.reset(token)
+        # loads nested in another load's still belong to it
+        if (outer := collected_messages.get()) is not None:
+            outer.extend(messages)
+        return result, messages
+
+    result, messages = await query_result_cache.get_or_load(
+        fingerprint, load_with_messages, ttl=c["QUERY_RESULT_CACHE_TTL_SECONDS"]
+    )
+
+    # info messages from the search (e.g. "no variants available") still belong in this response
+    if not loaded_here:
+        for m in messages:
+            add_message(m)
+
+    return result
+
+
+def invalidate_query_results(project_id=None, dataset_id=None) -> None:
+    """
+    Drop cached query results, e.g. after new variants are ingested in gohan.
+    With no arguments everything is dropped, otherwise only results for the given project (and dataset).
+    """
+    if project_id is None and dataset_id is None:
+        query_result_cache.invalidate()
+        return
+    query_result_cache.invalidate_where(
+        lambda key: key[1] == project_id and (dataset_id is None or key[2] == dataset_id)
+    )
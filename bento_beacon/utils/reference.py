@@ -1,21 +1,76 @@
 import aiohttp
+import asyncio
+import os
+import sqlite3
+import threading
 from json import JSONDecodeError
 from flask import current_app
+from .cache import AsyncCache
 from .exceptions import APIException
-from .http import tcp_connector
+from .http import on_io_loop, upstream_session
 from ..authz.access import create_access_header_or_fall_back
 
+GenePosition = dict[str, str | int | None]
 
-async def gene_position_lookup(gene_id: str, assembly_id: str) -> dict[str, str | int | None]:
+# gene coordinates practically never change, so lookups are cached in memory and, if configured, in a sqlite file
+# (assembly id, gene id) -> {"chromosome": ..., "start": ..., "end": ...}
+gene_position_cache = AsyncCache("gene_positions", max_size=10_000)
+
+REFERENCE_FEATURES_PAGE_SIZE = 1000
+
+
+async def gene_position_lookup(gene_id: str, assembly_id: str) -> GenePosition:
+    ttl = current_app.config["GENE_POSITION_CACHE_TTL_SECONDS"]
+    return await gene_position_cache.get_or_load(
+        (assembly_id, gene_id),
+        lambda: stored_or_reference_gene_position(gene_id, assembly_id),
+        # don't remember genes that weren't found
+        ttl=lambda position: ttl if position else 0,
+    )
+
+
+async def stored_or_reference_gene_position(gene_id: str, assembly_id: str) -> GenePosition:
+    # sqlite calls block, so they run in a worker thread rather than on the io loop
+    store = await asyncio.to_thread(gene_position_store)
+    if store is not None and (position := await asyncio.to_thread(store.get, assembly_id, gene_id)):
+        return position
+
+    position = await reference_gene_position(gene_id, assembly_id)
+    if store is not None and position:
+        await asyncio.to_thread(store.put_many, assembly_id, {gene_id: position})
+    return position
+
+
+@on_io_loop
+async def reference_gene_position(gene_id: str, assembly_id: str) -> GenePosition:
     reference_url = current_app.config["REFERENCE_URL"] + f"/genomes/{assembly_id}/features?name={gene_id}"
+    results = await reference_features_call(reference_url)
+
+    if not results:
+        return {}
+
+    return gene_position_from_feature(results[0])
+
+
+@on_io_loop
+async def reference_contigs(assembly_id: str) -> list[dict]:
+    reference_url = current_app.config["REFERENCE_URL"] + f"/genomes/{assembly_id}"
+    return (await reference_call(reference_url)).get("contigs") or []
+
+
+async def reference_features_call(reference_url: str) -> list[dict]:
+    return (await reference_call(reference_url)).get("results") or []
+
+
+async def reference_call(reference_url: str) -> dict:
     try:
-        async with aiohttp.ClientSession(connector=tcp_connector(current_app.config)) as s:
-            async with s.get(reference_url, headers=await create_access_header_or_fall_back()) as r:
+        s = upstream_session("reference")
+        async with s.get(reference_url, headers=await create_access_header_or_fall_back()) as r:
 
-                if not r.ok:
-                    current_app.logger.warning(f"reference service error, status: {r.status_code}, message: {r.text}")
-                    raise APIException(message="error searching reference service")
-                results = (await r.json()).get("results")
+            if not r.ok:
+                current_app.logger.warning(f"reference service error, status: {r.status}, message: {r.text}")
+                raise APIException(message="error searching reference service")
+            return await r.json()
 
     except JSONDecodeError:
         current_app.logger.error(f"error reading response from reference service")
@@ -24,12 +79,92 @@ async def gene_position_lookup(gene_id: str, assembly_id: str) -> dict[str, str
         current_app.logger.error(f"reference error: {e}")
         raise APIException(message="error calling reference service")
 
-    if not results:
-        return {}
 
-    chromosome = results[0].get("contig_name", "").removeprefix("chr")
-    entries = results[0].get("entries")
+def gene_position_from_feature(feature: dict) -> GenePosition:
+    chromosome = feature.get("contig_name", "").removeprefix("chr")
+    entries = feature.get("entries")
     start = entries[0].get("start_pos") if entries else None
     end = entries[0].get("end_pos") if entries else None
 
     return {"chromosome": chromosome, "start": start, "end": end}
+
+
+@on_io_loop
+async def preload_gene_positions(assembly_id: str) -> int:
+    """
+    Fetch every gene feature for an assembly from the reference service and save them all to the gene position store.
+    Returns the number of genes saved.
+    """
+    store = await asyncio.to_thread(gene_position_store)
+    if store is None:
+        raise APIException(message="no gene position store configured, set BEACON_GENE_POSITION_CACHE_PATH")
+
+    base_url = current_app.config["REFERENCE_URL"] + f"/genomes/{assembly_id}/features?feature_type=gene"
+    offset = 0
+    num_saved = 0
+    while True:
+        page = await reference_call(f"{base_url}&offset={offset}&limit={REFERENCE_FEATURES_PAGE_SIZE}")
+        features = page.get("results") or []
+        positions = {f["name"]: gene_position_from_feature(f) for f in features if f.get("name")}
+        await asyncio.to_thread(store.put_many, assembly_id, positions)
+        num_saved += len(positions)
+        offset += len(features)
+
+        total = page.get("pagination", {}).get("total")
+        if not features or (total is not None and offset >= total):
+            return num_saved
+
+
+# -------------------------------------------------------
+#       persistence
+# -------------------------------------------------------
+
+
+class GenePositionStore:
+    """
+    Gene positions saved in a small sqlite table, so they survive restarts and can be preloaded in bulk.
+    Calls block, so shouldn't be made on the io loop. One connection is kept open and shared between threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._db as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS gene_positions ("
+                "assembly_id TEXT NOT NULL, gene_id TEXT NOT NULL, chromosome TEXT, start INTEGER, end INTEGER, "
+                "PRIMARY KEY (assembly_id, gene_id))"
+            )
+
+    def get(self, assembly_id: str, gene_id: str) -> GenePosition | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT chromosome, start, end FROM gene_positions WHERE assembly_id = ? AND gene_id = ?",
+                (assembly_id, gene_id),
+            ).fetchone()
+        if row is None:
+            return None
+        chromosome, start, end = row
+        return {"chromosome": chromosome, "start": start, "end": end}
+
+    def put_many(self, assembly_id: str, positions: dict[str, GenePosition]) -> None:
+        rows = [(assembly_id, gene_id, p["chromosome"], p["start"], p["end"]) for gene_id, p in positions.items()]
+        with self._lock, self._db as db:
+            db.executemany("INSERT OR REPLACE INTO gene_positions VALUES (?, ?, ?, ?, ?)", rows)
+
+
+# (pid, path) -> store, since sqlite connections can't be shared with forked worker processes
+_gene_position_stores: dict[tuple[int, str], GenePositionStore] = {}
+_gene_position_stores_lock = threading.Lock()
+
+
+def gene_position_store() -> GenePositionStore | None:
+    path = current_app.config["GENE_POSITION_CACHE_PATH"]
+    if not path:
+        return None
+    key = (os.getpid(), path)
+    with _gene_position_stores_lock:
+        if key not in _gene_position_stores:
+            _gene_position_stores[key] = GenePositionStore(path)
+        return _gene_position_stores[key]
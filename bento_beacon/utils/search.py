@@ -1,5 +1,7 @@
+import asyncio
 from flask import current_app
 from functools import reduce
+from typing import Awaitable
 from .gohan_utils import query_gohan
 from .katsu_utils import (
     katsu_filters_query,
@@ -9,6 +11,27 @@ from .katsu_utils import (
 from .beacon_response import add_info_to_response
 
 
+async def intersection_of_searches(searches: list[Awaitable[list]]) -> list:
+    """
+    Run independent id searches concurrently and return the intersection of their results.
+    An empty result from any one search makes the intersection empty, so the others are cancelled as soon as it arrives.
+    """
+    tasks = [asyncio.ensure_future(s) for s in searches]
+    results = []
+    try:
+        for next_finished in asyncio.as_completed(tasks):
+            ids = await next_finished
+            if not ids:
+                return []
+            results.append(set(ids))
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return list(reduce(set.intersection, results)) if results else []
+
+
 # TODO: search by linked field set elements instead of hardcoding
 async def biosample_id_search(
     variants_query=None,
@@ -18,7 +41,7 @@ async def biosample_id_search(
     project_id=None,
     dataset_id=None,
 ):
-    results_biosample_ids = {}
+    searches = []
 
     if not (variants_query or phenopacket_filters or experiment_filters or config_filters):
         return []
@@ -28,33 +51,33 @@ async def biosample_id_search(
             # variants query even though there are no variants in this beacon, this can happen in a network context
             add_info_to_response("No variants available at this beacon, query by metadata values only")
             return []
-        variant_sample_ids = await query_gohan(variants_query, "count", ids_only=True)
-        if not variant_sample_ids:
-            return []
-        results_biosample_ids["variant_sample_ids"] = variant_sample_ids
+        searches.append(query_gohan(variants_query, "count", ids_only=True))
 
     if experiment_filters:
-        experiment_sample_ids = await katsu_filters_query(
-            experiment_filters, "experiment", get_biosample_ids=True, project_id=project_id, dataset_id=dataset_id
+        searches.append(
+            katsu_filters_query(
+                experiment_filters, "experiment", get_biosample_ids=True, project_id=project_id, dataset_id=dataset_id
+            )
         )
-        if not experiment_sample_ids:
-            return []
-        results_biosample_ids["experiment_sample_ids"] = experiment_sample_ids
 
     # next two return *all* biosample ids for matching individuals
 
     if phenopacket_filters:
-        phenopacket_sample_ids = await katsu_filters_query(
-            phenopacket_filters, "phenopacket", get_biosample_ids=True, project_id=project_id, dataset_id=dataset_id
+        searches.append(
+            katsu_filters_query(
+                phenopacket_filters, "phenopacket", get_biosample_ids=True, project_id=project_id, dataset_id=dataset_id
+            )
         )
-        if not phenopacket_sample_ids:
-            return []
-        results_biosample_ids["phenopacket_sample_ids"] = phenopacket_sample_ids
 
     if config_filters:
-        config_individuals = await search_from_config(config_filters, project_id=project_id, dataset_id=dataset_id)
-        if not config_individuals:
-            return []
-        results_biosample_ids["config_sample_ids"] = await biosample_ids_for_individuals(config_individuals)
+        searches.append(config_biosample_id_search(config_filters, project_id=project_id, dataset_id=dataset_id))
+
+    # independent until the final intersection, so run them all at once
+    return await intersection_of_searches(searches)
 
-    return list(reduce(set.intersection, (set(ids) for ids in results_biosample_ids.values())))
+
+async def config_biosample_id_search(config_filters, project_id=None, dataset_id=None):
+    config_individuals = await search_from_config(config_filters, project_id=project_id, dataset_id=dataset_id)
+    if not config_individuals:
+        return []
+    return await biosample_ids_for_individuals(config_individuals)
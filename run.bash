@@ -7,7 +7,13 @@ export FLASK_APP='bento_beacon.app:app'
 # Set default internal port to 5000
 : "${INTERNAL_PORT:=5000}"
 
+# Each worker is a separate process with its own event loop, connection pools and caches, shared by its threads.
+# Async views run on the worker's event loop, so one worker mostly uses one core: to scale across cores, run
+# several workers, e.g. BEACON_WORKERS=4. Caches are not shared between workers.
+: "${BEACON_WORKERS:=1}"
+: "${BEACON_THREADS:=$(( 2 * $(nproc --all) + 1))}"
+
 python -m gunicorn "${FLASK_APP}" \
-  -w 1 \
-  --threads $(( 2 * $(nproc --all) + 1)) \
+  -w "${BEACON_WORKERS}" \
+  --threads "${BEACON_THREADS}" \
   -b "0.0.0.0:${INTERNAL_PORT}"
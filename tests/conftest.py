@@ -41,13 +41,18 @@ def beacon_test_app():
             "BEACON_CLIENT_ID": "aggregation",
             "BEACON_CLIENT_SECRET": "FAKE123",
             "BENTO_BEACON_NETWORK_ENABLED": "true",
+            "BEACON_NETWORK_BACKGROUND_REFRESH": "false",  # network beacons are refreshed as needed instead
         }
     )
 
     from bento_beacon.app import app
+    from bento_beacon.utils.cache import clear_all_caches
 
     yield app
 
+    # caches are process-wide, don't leak mocked upstream responses into other tests
+    clear_all_caches()
+
 
 @pytest.fixture
 def client(beacon_test_app):
@@ -1,4 +1,5 @@
 from aiohttp import ClientConnectionError
+from yarl import URL
 
 from .test_routes import (
     mock_permissions_all,
@@ -229,3 +230,41 @@ def test_network_beacon_with_no_filter_intersection(app_config, client, aiorespo
     response = client.get("/network")
     assert response.status_code == 200
     assert "beacons" in response.get_json()
+
+
+def test_network_beacons_served_from_registry(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_network_init(app_config, aioresponse)
+    mock_network_beacon_query_response(aioresponse)
+    response = client.post(f"/network/beacons/ca.fake2.bento.beacon/individuals", json=BEACON_REQUEST_BODY)
+    assert response.status_code == 200
+
+    # other beacons' details are kept, so only the query itself goes to the other beacon
+    mock_permissions_all(app_config, aioresponse)
+    mock_network_beacon_query_response(aioresponse)
+    response = client.post(f"/network/beacons/ca.fake2.bento.beacon/individuals", json=BEACON_REQUEST_BODY)
+    assert response.status_code == 200
+    overview_calls = aioresponse.requests[("GET", URL("https://fake2.bento.ca/api/beacon/overview"))]
+    assert len(overview_calls) == 1
+
+
+def test_network_beacon_query_only_waits_on_that_beacon(app_config, client, aioresponse, monkeypatch):
+    # a third beacon that never answers
+    unresponsive_url = "https://fake3.bento.ca/api/beacon"
+    beacons = {**app_config["NETWORK_CONFIG"]["beacons"], "fake3": {"api_url": unresponsive_url}}
+    monkeypatch.setitem(app_config, "NETWORK_CONFIG", {**app_config["NETWORK_CONFIG"], "beacons": beacons})
+    aioresponse.get(unresponsive_url + "/overview", status=503, repeat=True)
+    from bento_beacon.network.utils.network_beacons import network_registry
+
+    # forget ids seen in other tests
+    monkeypatch.setattr(network_registry, "_urls_by_id", {})
+
+    for _ in range(2):
+        mock_permissions_all(app_config, aioresponse)
+        mock_network_init(app_config, aioresponse)
+        mock_network_beacon_query_response(aioresponse)
+        response = client.post(f"/network/beacons/ca.fake2.bento.beacon/individuals", json=BEACON_REQUEST_BODY)
+        assert response.status_code == 200
+
+    # tried once while fake2's id was still unknown, not again once it was
+    assert len(aioresponse.requests[("GET", URL(unresponsive_url + "/overview"))]) == 1
@@ -0,0 +1,34 @@
+import json
+import pytest
+
+
+@pytest.fixture
+def request_spec_uri(tmp_path):
+    # minimal spec layout, with a request schema referring to a sibling directory
+    (tmp_path / "requests").mkdir()
+    (tmp_path / "common").mkdir()
+    (tmp_path / "requests" / "beaconRequestBody.json").write_text(
+        json.dumps(
+            {
+                "$schema": "https://json-schema.org/draft/2020-12/schema",
+                "type": "object",
+                "properties": {"meta": {"$ref": "../common/meta.json"}},
+            }
+        )
+    )
+    (tmp_path / "common" / "meta.json").write_text(
+        json.dumps({"type": "object", "properties": {"apiVersion": {"type": "string"}}})
+    )
+    return (tmp_path / "requests").as_uri() + "/"
+
+
+def test_request_body_validator_resolves_refs_in_memory(beacon_test_app, request_spec_uri, tmp_path):
+    from bento_beacon.utils.beacon_request import request_body_validator
+
+    validator = request_body_validator(request_spec_uri)
+    assert request_body_validator(request_spec_uri) is validator
+
+    # schemas are only read once
+    (tmp_path / "common" / "meta.json").unlink()
+    assert validator.is_valid({"meta": {"apiVersion": "v2.0"}})
+    assert not validator.is_valid({"meta": {"apiVersion": 2}})
@@ -0,0 +1,120 @@
+import asyncio
+from yarl import URL
+from bento_beacon.authz.access import get_access_token
+from bento_beacon.utils.cache import AsyncCache
+from .conftest import TOKEN_URL
+from .test_routes import mock_retrieve_token
+
+
+def test_cache_single_flight_load():
+    cache = AsyncCache("test", ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def many_lookups():
+        return await asyncio.gather(*(cache.get_or_load("key", loader) for _ in range(10)))
+
+    assert asyncio.run(many_lookups()) == ["value"] * 10
+    assert asyncio.run(cache.get_or_load("key", loader)) == "value"
+    assert len(calls) == 1
+
+
+def test_cache_lru_eviction_and_invalidation():
+    cache = AsyncCache("test", ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_cache_bounded_by_total_weight():
+    cache = AsyncCache("test", ttl=60, weigher=len, max_weight=lambda: 5)
+    cache.set("a", [1, 2])
+    cache.set("b", [1, 2])
+    cache.set("c", [1, 2])
+    assert cache.get("a") is None
+    assert cache.get("b") == [1, 2]
+    # larger than the whole cache, not stored
+    cache.set("d", [1, 2, 3, 4, 5, 6])
+    assert cache.get("d") is None
+    assert len(cache) == 2
+    cache.set("b", [1])
+    cache.set("e", [1, 2])
+    assert len(cache) == 3
+
+
+def test_cache_zero_ttl_not_stored():
+    cache = AsyncCache("test", ttl=lambda v: 0 if v is None else 60)
+    cache.set("missing", None)
+    cache.set("found", "yes")
+    assert "missing" not in cache._entries
+    assert cache.get("found") == "yes"
+
+
+def test_cache_stale_while_revalidate():
+    cache = AsyncCache("test", ttl=0.05, stale_ttl=60)
+    versions = iter(range(10))
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return next(versions)
+
+    async def lookups():
+        first = await cache.get_or_load("key", loader)
+        await asyncio.sleep(0.1)
+        # expired: served stale while a refresh runs in the background
+        stale = await cache.get_or_load("key", loader)
+        await asyncio.sleep(0.05)
+        refreshed = await cache.get_or_load("key", loader)
+        return first, stale, refreshed
+
+    assert asyncio.run(lookups()) == (0, 0, 1)
+
+
+def test_query_result_messages_kept_per_query(beacon_test_app):
+    from flask import g
+    from bento_beacon.utils.beacon_response import add_info_to_response
+    from bento_beacon.utils.query_cache import cached_query_result
+
+    def loader(message):
+        async def load():
+            await asyncio.sleep(0.01)
+            add_info_to_response(message)
+            await asyncio.sleep(0.01)
+            return message
+
+        return load
+
+    async def batch():
+        return await asyncio.gather(*(cached_query_result((m,), loader(m)) for m in ("first", "second")))
+
+    with beacon_test_app.test_request_context():
+        g.response_info = {}
+        assert asyncio.run(batch()) == ["first", "second"]
+        assert len(g.response_info["messages"]) == 2
+
+        # from the cache, each result only brings back messages from its own load
+        g.response_info = {}
+        assert asyncio.run(cached_query_result(("first",), loader("unused"))) == "first"
+        assert g.response_info["messages"] == [{"description": "first", "level": "info"}]
+
+
+def test_access_token_cached(app_config, aioresponse):
+    mock_retrieve_token(app_config, aioresponse)
+
+    async def tokens():
+        return await asyncio.gather(*(get_access_token() for _ in range(5)))
+
+    assert set(asyncio.run(tokens())) == {"fakeTokenAbc123"}
+    assert asyncio.run(get_access_token()) == "fakeTokenAbc123"
+    assert len(aioresponse.requests[("POST", URL(TOKEN_URL))]) == 1
@@ -0,0 +1,326 @@
+import asyncio
+import re
+import time
+from yarl import URL
+from bento_beacon.utils.gohan_utils import (
+    GohanOverview,
+    build_allele_index,
+    gohan_overview,
+    gohan_overview_cache,
+    gohan_total_variants_for_samples,
+    gohan_variants_count_for_samples,
+    query_gohan,
+)
+from bento_beacon.utils.http import on_io_loop
+from .test_routes import mock_retrieve_token
+
+GOHAN_OVERVIEW_RESPONSE = {
+    "assemblyIDs": {"GRCh37": 0, "GRCh38": 600},
+    "sampleIDs": {"hg00096": 100, "hg00097": 200, "hg00099": 300},
+}
+
+
+def mock_gohan_overview_with_samples(app_config, aioresponse):
+    gohan_overview_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_OVERVIEW_ENDPOINT"]
+    aioresponse.get(gohan_overview_url, payload=GOHAN_OVERVIEW_RESPONSE)
+    return gohan_overview_url
+
+
+def test_gohan_overview_totals():
+    overview = GohanOverview(GOHAN_OVERVIEW_RESPONSE)
+    assert overview.total_variants == 600
+    assert overview.total_for_samples(["hg00096", "hg00099", "hg00099", "missing"]) == 400
+    assert overview.counts_by_assembly_id == {"GRCh37": 0, "GRCh38": 600}
+
+
+def test_gohan_overview_cached(app_config, aioresponse):
+    mock_retrieve_token(app_config, aioresponse)
+    overview_url = mock_gohan_overview_with_samples(app_config, aioresponse)
+    # sample ids from katsu are uppercase, gohan overview ids are lowercase
+    assert asyncio.run(gohan_total_variants_for_samples(["HG00096", "HG00097"])) == 300
+    assert asyncio.run(gohan_total_variants_for_samples(["HG00099"])) == 300
+    assert len(aioresponse.requests[("GET", URL(overview_url))]) == 1
+
+
+def mock_gene_lookup(app_config, aioresponse, assembly_id, start, end):
+    reference_url = app_config["REFERENCE_URL"] + f"/genomes/{assembly_id}/features?name=BRCA1"
+    gene_feature = {"contig_name": "chr17", "entries": [{"start_pos": start, "end_pos": end}]}
+    aioresponse.get(reference_url, payload={"results": [gene_feature]})
+
+
+def test_gene_id_query_counts_summed_across_assemblies(app_config, aioresponse):
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gohan_overview_with_samples(app_config, aioresponse)
+    mock_gene_lookup(app_config, aioresponse, "GRCh37", 41196312, 41277500)
+    mock_gene_lookup(app_config, aioresponse, "GRCh38", 43044295, 43125483)
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    aioresponse.get(re.compile(rf"{gohan_count_url}.*GRCh37.*"), payload={"results": [{"count": 3}]})
+    aioresponse.get(re.compile(rf"{gohan_count_url}.*GRCh38.*"), payload={"results": [{"count": 4}]})
+    assert asyncio.run(query_gohan({"geneId": "BRCA1"}, "count")) == {"count": 7}
+
+
+def test_gene_positions_cached_and_stored(app_config, aioresponse, monkeypatch, tmp_path):
+    from bento_beacon.utils.reference import gene_position_cache, gene_position_lookup
+
+    monkeypatch.setitem(app_config, "GENE_POSITION_CACHE_PATH", str(tmp_path / "gene_positions.sqlite3"))
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gene_lookup(app_config, aioresponse, "GRCh38", 43044295, 43125483)
+    expected = {"chromosome": "17", "start": 43044295, "end": 43125483}
+    assert asyncio.run(gene_position_lookup("BRCA1", "GRCh38")) == expected
+    assert asyncio.run(gene_position_lookup("BRCA1", "GRCh38")) == expected
+
+    # still available after the in-memory cache is cleared, from the sqlite store
+    gene_position_cache.invalidate()
+    assert asyncio.run(gene_position_lookup("BRCA1", "GRCh38")) == expected
+
+    reference_url = app_config["REFERENCE_URL"] + "/genomes/GRCh38/features?name=BRCA1"
+    assert len(aioresponse.requests[("GET", URL(reference_url))]) == 1
+
+
+def test_gene_position_store_writes_off_io_loop(app_config, aioresponse, monkeypatch, tmp_path):
+    from bento_beacon.utils.reference import GenePositionStore, gene_position_lookup
+
+    monkeypatch.setitem(app_config, "GENE_POSITION_CACHE_PATH", str(tmp_path / "gene_positions.sqlite3"))
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gene_lookup(app_config, aioresponse, "GRCh38", 43044295, 43125483)
+
+    put_many = GenePositionStore.put_many
+
+    def slow_put_many(self, *args):
+        time.sleep(0.2)
+        put_many(self, *args)
+
+    monkeypatch.setattr(GenePositionStore, "put_many", slow_put_many)
+
+    @on_io_loop
+    async def lookup_while_ticking():
+        ticks = 0
+        lookup = asyncio.ensure_future(gene_position_lookup("BRCA1", "GRCh38"))
+        while not lookup.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        return await lookup, ticks
+
+    position, ticks = asyncio.run(lookup_while_ticking())
+    assert position == {"chromosome": "17", "start": 43044295, "end": 43125483}
+    # the loop kept running other work while the position was written
+    assert ticks >= 10
+
+
+def test_preload_gene_positions(app_config, aioresponse, monkeypatch, tmp_path):
+    from bento_beacon.utils.reference import gene_position_store, preload_gene_positions
+
+    monkeypatch.setitem(app_config, "GENE_POSITION_CACHE_PATH", str(tmp_path / "gene_positions.sqlite3"))
+    mock_retrieve_token(app_config, aioresponse)
+    features_url = app_config["REFERENCE_URL"] + "/genomes/GRCh38/features?feature_type=gene"
+    genes = [
+        {"name": "BRCA1", "contig_name": "chr17", "entries": [{"start_pos": 43044295, "end_pos": 43125483}]},
+        {"name": "BRCA2", "contig_name": "chr13", "entries": [{"start_pos": 32315508, "end_pos": 32400268}]},
+    ]
+    aioresponse.get(
+        features_url + "&offset=0&limit=1000", payload={"results": genes, "pagination": {"offset": 0, "total": 2}}
+    )
+    assert asyncio.run(preload_gene_positions("GRCh38")) == 2
+    assert gene_position_store().get("GRCh38", "BRCA2") == {"chromosome": "13", "start": 32315508, "end": 32400268}
+
+
+def mock_gohan_tile(app_config, aioresponse, lower_bound, calls):
+    gohan_search_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_SEARCH_ENDPOINT"]
+    aioresponse.get(
+        re.compile(rf"{gohan_search_url}.*lowerBound={lower_bound}&.*"),
+        payload={"results": [{"calls": calls}]},
+    )
+
+
+BRACKET_QUERY = {"referenceName": "1", "assemblyId": "GRCh38", "start": [100, 110], "end": [100, 120]}
+
+
+def test_bracket_query_scans_tiles_and_filters_ends(app_config, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 5)
+    mock_retrieve_token(app_config, aioresponse)
+    # gohan is searched over starts in [101, 110] (one-based), in two tiles, once for both queries
+    mock_gohan_tile(
+        app_config,
+        aioresponse,
+        101,
+        [
+            {"sample_id": "S1", "pos": 101, "ref": ["A"], "alt": ["T"]},
+            {"sample_id": "S1", "pos": 103, "ref": ["A" * 30], "alt": ["A"]},  # ends outside bracket
+        ],
+    )
+    mock_gohan_tile(app_config, aioresponse, 106, [{"sample_id": "S2", "pos": 108, "ref": ["AC"], "alt": ["A"]}])
+
+    assert asyncio.run(query_gohan(BRACKET_QUERY, "count")) == {"count": 2}
+    assert sorted(asyncio.run(query_gohan(BRACKET_QUERY, "count", ids_only=True))) == ["S1", "S2"]
+
+
+def test_bracket_query_uses_symbolic_variant_ends(app_config, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 5)
+    mock_retrieve_token(app_config, aioresponse)
+    deletion = {"sample_id": "S1", "pos": 101, "ref": ["A"], "alt": ["<DEL>"]}
+    mock_gohan_tile(
+        app_config,
+        aioresponse,
+        101,
+        [
+            {**deletion, "info": [{"id": "END", "value": "300"}]},  # ends past the end bracket
+            {**deletion, "pos": 102, "info": [{"id": "SVLEN", "value": "-150"}]},  # ends at 252, past it too
+            {**deletion, "pos": 103, "info": [{"id": "SVLEN", "value": "-10"}]},  # ends at 113, inside
+        ],
+    )
+    mock_gohan_tile(app_config, aioresponse, 106, [])
+
+    # the ref base alone would put every deletion's end inside the end bracket
+    assert asyncio.run(query_gohan(BRACKET_QUERY, "count")) == {"count": 1}
+
+
+def test_range_query_filtered_by_variant_type_and_length(app_config, aioresponse):
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gohan_tile(
+        app_config,
+        aioresponse,
+        101,
+        [
+            {"sample_id": "S1", "pos": 101, "ref": ["A"], "alt": ["T"]},
+            {"sample_id": "S1", "pos": 102, "ref": ["ACGT"], "alt": ["A"]},
+            {"sample_id": "S2", "pos": 104, "ref": ["ACGTACGTAC"], "alt": ["A"]},
+            {"sample_id": "S3", "pos": 106, "ref": ["A"], "alt": ["<DEL>"]},
+        ],
+    )
+    range_query = {
+        "referenceName": "1",
+        "assemblyId": "GRCh38",
+        "start": [100],
+        "end": [200],
+        "variantType": "DEL",
+        "variantMaxLength": "5",
+    }
+    assert asyncio.run(query_gohan(range_query, "count")) == {"count": 1}
+
+
+def test_wide_range_count_split_into_tiles(app_config, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 40)
+    mock_retrieve_token(app_config, aioresponse)
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    # tiles are aligned to multiples of the tile size
+    for lower_bound, count in ((101, 3), (121, 0), (161, 4)):
+        aioresponse.get(
+            re.compile(rf"{gohan_count_url}.*lowerBound={lower_bound}&.*"), payload={"results": [{"count": count}]}
+        )
+    range_query = {"referenceName": "1", "assemblyId": "GRCh38", "start": [100], "end": [200]}
+    assert asyncio.run(query_gohan(range_query, "count")) == {"count": 7}
+
+
+def test_counts_for_samples_scanned_in_tiles(app_config, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 400)
+    mock_retrieve_token(app_config, aioresponse)
+    # [100, 1000] (one-based) is searched in three tiles, for sample ids only
+    mock_gohan_tile(app_config, aioresponse, 100, [{"sample_id": "HG00096"}, {"sample_id": "HG00099"}])
+    mock_gohan_tile(app_config, aioresponse, 401, [{"sample_id": "HG00096"}])
+    mock_gohan_tile(app_config, aioresponse, 801, [{"sample_id": "HG00097"}, {"sample_id": "HG00099"}])
+
+    query = {"referenceName": "1", "assemblyId": "GRCh38", "start": [99], "end": [1000]}
+    assert asyncio.run(gohan_variants_count_for_samples(query, ["hg00096", "hg00097", "hg00098"])) == 3
+    gohan_search_calls = [k for k in aioresponse.requests if app_config["GOHAN_SEARCH_ENDPOINT"] in str(k[1])]
+    assert len(gohan_search_calls) == 3
+    assert all("getSampleIdsOnly=True" in str(k[1]) for k in gohan_search_calls)
+
+
+def test_wide_ids_only_record_query_split_into_tiles(app_config, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 400)
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gohan_tile(app_config, aioresponse, 100, [{"sample_id": "HG00096"}])
+    mock_gohan_tile(app_config, aioresponse, 401, [{"sample_id": "HG00097"}])
+
+    query = {"referenceName": "1", "assemblyId": "GRCh38", "start": [99], "end": [800]}
+    assert sorted(asyncio.run(query_gohan(query, "record", ids_only=True))) == ["HG00096", "HG00097"]
+
+
+def test_gohan_results_cached_with_sub_range_lookup(app_config, aioresponse):
+    mock_retrieve_token(app_config, aioresponse)
+    mock_gohan_tile(
+        app_config,
+        aioresponse,
+        101,
+        [
+            {"sample_id": "S1", "pos": 101, "ref": ["A"], "alt": ["T"]},
+            {"sample_id": "S2", "pos": 150, "ref": ["ACGT"], "alt": ["A"]},
+            {"sample_id": "S3", "pos": 199, "ref": ["A"], "alt": ["G"]},
+        ],
+    )
+    range_query = {"referenceName": "1", "assemblyId": "GRCh38", "start": [100], "end": [200]}
+    full_results = asyncio.run(query_gohan(range_query, "record"))
+    assert len(full_results) == 3
+    assert asyncio.run(query_gohan(range_query, "record")) == full_results
+
+    # searches and counts inside the cached window are answered without calling gohan again
+    sub_range_query = {**range_query, "start": [120], "end": [160]}
+    assert asyncio.run(query_gohan(sub_range_query, "count")) == {"count": 1}
+    assert asyncio.run(query_gohan(sub_range_query, "record", ids_only=True)) == ["S2"]
+
+    gohan_search_calls = [k for k in aioresponse.requests if app_config["GOHAN_SEARCH_ENDPOINT"] in str(k[1])]
+    assert len(gohan_search_calls) == 1
+
+
+def build_test_allele_index(app_config, aioresponse, monkeypatch, tmp_path, grch38_calls=2):
+    # two calls are found on the reference's contigs, gohan may have others
+    monkeypatch.setitem(app_config, "ALLELE_INDEX_PATH", str(tmp_path / "alleles.idx"))
+    monkeypatch.setitem(app_config, "GOHAN_RANGE_TILE_SIZE", 100)
+    mock_retrieve_token(app_config, aioresponse)
+    gohan_overview_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_OVERVIEW_ENDPOINT"]
+    overview = {**GOHAN_OVERVIEW_RESPONSE, "assemblyIDs": {"GRCh37": 0, "GRCh38": grch38_calls}}
+    aioresponse.get(gohan_overview_url, payload=overview, repeat=True)
+    aioresponse.get(
+        app_config["REFERENCE_URL"] + "/genomes/GRCh38", payload={"contigs": [{"name": "chr1", "length": 200}]}
+    )
+    mock_gohan_tile(app_config, aioresponse, 1, [{"sample_id": "S1", "pos": 42, "ref": ["A"], "alt": ["T", "G"]}])
+    mock_gohan_tile(app_config, aioresponse, 101, [{"sample_id": "S2", "pos": 150, "ref": ["ACGT"], "alt": ["A"]}])
+
+    return asyncio.run(build_allele_index())
+
+
+def sequence_query(pos, ref, alt):
+    query = {"referenceName": "1", "assemblyId": "GRCh38", "start": [pos - 1], "referenceBases": ref}
+    return asyncio.run(query_gohan({**query, "alternateBases": alt}, "boolean"))
+
+
+def test_allele_index_answers_misses_without_gohan(app_config, aioresponse, monkeypatch, tmp_path):
+    assert build_test_allele_index(app_config, aioresponse, monkeypatch, tmp_path) == {"GRCh37": 0, "GRCh38": 2}
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    aioresponse.get(re.compile(rf"{gohan_count_url}.*"), payload={"results": [{"count": 1}]}, repeat=True)
+
+    assert sequence_query(42, "A", "G") == {"count": 1}
+    assert sequence_query(150, "acgt", "a") == {"count": 1}
+    assert sequence_query(42, "A", "C") == {"count": 0}
+    assert sequence_query(43, "A", "T") == {"count": 0}
+    gohan_count_calls = [k for k in aioresponse.requests if app_config["GOHAN_COUNT_ENDPOINT"] in str(k[1])]
+    assert len(gohan_count_calls) == 2
+
+
+def test_allele_index_skips_assemblies_not_fully_indexed(app_config, aioresponse, monkeypatch, tmp_path):
+    # gohan has calls that weren't found searching the reference's contigs, e.g. on other contigs
+    assert build_test_allele_index(app_config, aioresponse, monkeypatch, tmp_path, grch38_calls=7) == {"GRCh37": 0}
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    aioresponse.get(re.compile(rf"{gohan_count_url}.*"), payload={"results": [{"count": 5}]})
+
+    query = {"referenceName": "X", "assemblyId": "GRCh38", "start": [99], "referenceBases": "A", "alternateBases": "T"}
+    assert asyncio.run(query_gohan(query, "count")) == {"count": 5}
+
+
+def test_allele_index_not_trusted_after_ingest(app_config, aioresponse, monkeypatch, tmp_path):
+    monkeypatch.setitem(app_config, "GOHAN_RECENT_OVERVIEW_MAX_AGE_SECONDS", 0)
+    build_test_allele_index(app_config, aioresponse, monkeypatch, tmp_path)
+    assert asyncio.run(gohan_overview()).counts_by_assembly_id["GRCh38"] == 2
+
+    # gohan has new data, so the index can't be trusted until it's updated
+    aioresponse.clear()
+    mock_retrieve_token(app_config, aioresponse)
+    gohan_overview_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_OVERVIEW_ENDPOINT"]
+    new_overview = {**GOHAN_OVERVIEW_RESPONSE, "assemblyIDs": {"GRCh37": 0, "GRCh38": 3}}
+    aioresponse.get(gohan_overview_url, payload=new_overview, repeat=True)
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    aioresponse.get(re.compile(rf"{gohan_count_url}.*"), payload={"results": [{"count": 1}]})
+
+    # even though the shared overview snapshot still has the counts the index was built for
+    assert gohan_overview_cache.get("overview").counts_by_assembly_id["GRCh38"] == 2
+    assert sequence_query(42, "A", "C") == {"count": 1}
@@ -0,0 +1,41 @@
+import asyncio
+from yarl import URL
+from .data.service_responses import drs_query_response
+from .test_routes import HANDOVER_FILES
+
+
+def test_drs_links_cached_across_handovers(beacon_test_app, app_config, aioresponse):
+    from bento_beacon.utils.handover_utils import drs_links_for_filenames
+
+    drs_query_url = app_config["DRS_URL"] + "/search?name=" + HANDOVER_FILES[0]
+    aioresponse.get(drs_query_url, payload=drs_query_response)
+
+    with beacon_test_app.test_request_context():
+        for _ in range(3):
+            links = asyncio.run(drs_links_for_filenames([HANDOVER_FILES[0]]))
+            assert links == {HANDOVER_FILES[0]: "https://bento-fake/api/drs/objects/fake123/download"}
+
+    # only one response is mocked, so any handover not served from cache would fail
+    assert len(aioresponse.requests[("GET", URL(drs_query_url))]) == 1
+
+
+def test_drs_lookups_limited_to_max_concurrent(app_config, monkeypatch):
+    from bento_beacon.utils import handover_utils
+
+    monkeypatch.setitem(app_config, "DRS_MAX_CONCURRENT_REQUESTS", 2)
+    in_flight = 0
+    max_in_flight = 0
+
+    async def slow_drs_link(filename):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return f"https://drs.local/{filename}"
+
+    monkeypatch.setattr(handover_utils, "drs_link_from_vcf_filename", slow_drs_link)
+    filenames = [f"file{i}.vcf.gz" for i in range(8)]
+    links = asyncio.run(handover_utils.drs_links_for_filenames(filenames))
+    assert links == {f: f"https://drs.local/{f}" for f in filenames}
+    assert max_in_flight == 2
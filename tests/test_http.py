@@ -0,0 +1,39 @@
+import asyncio
+from yarl import URL
+from bento_beacon.utils.katsu_utils import katsu_get
+from bento_beacon.utils.http import io_loop, on_io_loop, running_on_io_loop, upstream_session
+
+
+@on_io_loop
+async def session_for(service):
+    assert running_on_io_loop()
+    return upstream_session(service)
+
+
+def test_upstream_session_shared_across_event_loops():
+    # flask runs each async view in its own event loop, pooled sessions should outlive them
+    katsu_session = asyncio.run(session_for("katsu"))
+    assert asyncio.run(session_for("katsu")) is katsu_session
+    assert asyncio.run(session_for("gohan")) is not katsu_session
+
+
+def test_async_views_share_persistent_event_loop(beacon_test_app):
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    loop = beacon_test_app.async_to_sync(current_loop)()
+    assert beacon_test_app.async_to_sync(current_loop)() is loop
+    assert loop is io_loop()
+
+
+def test_identical_upstream_requests_coalesced(app_config, aioresponse):
+    url = app_config["KATSU_BASE_URL"] + app_config["KATSU_PROJECTS_ENDPOINT"]
+    aioresponse.get(url, payload={"results": []})
+
+    @on_io_loop
+    async def concurrent_gets():
+        return await asyncio.gather(*(katsu_get(app_config["KATSU_PROJECTS_ENDPOINT"]) for _ in range(5)))
+
+    # only one response is mocked, so any request not sharing it would fail
+    assert asyncio.run(concurrent_gets()) == [{"results": []}] * 5
+    assert len(aioresponse.requests[("GET", URL(url))]) == 1
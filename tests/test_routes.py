@@ -1,5 +1,8 @@
+import json
+import re
 from copy import deepcopy
 from aiohttp import ClientError
+from yarl import URL
 from bento_beacon.utils.exceptions import InvalidFilterError
 from .data.service_responses import (
     katsu_projects_response,
@@ -72,6 +75,9 @@ BEACON_TOO_MANY_DATASETS["query"]["datasets"] = {"datasetIds": [PROJECT_1_DATASE
 BEACON_FULL_RECORD_REQUEST_BODY = deepcopy(BEACON_REQUEST_BODY)
 BEACON_FULL_RECORD_REQUEST_BODY["query"]["requestedGranularity"] = "record"
 
+BEACON_PAGINATED_FULL_RECORD_REQUEST_BODY = deepcopy(BEACON_FULL_RECORD_REQUEST_BODY)
+BEACON_PAGINATED_FULL_RECORD_REQUEST_BODY["query"]["pagination"] = {"skip": 0, "limit": 5}
+
 BEACON_BOOL_REQUEST_BODY = deepcopy(BEACON_REQUEST_BODY)
 BEACON_BOOL_REQUEST_BODY["query"]["requestedGranularity"] = "boolean"
 
@@ -335,7 +341,6 @@ def test_service_info_scoped(app_config, client, aioresponse):
 
 
 def test_root(app_config, client, aioresponse):
-    mock_katsu_projects(app_config, aioresponse)  # scope check before request
     mock_katsu_projects(app_config, aioresponse)  # collecting dataset descriptions
     response = client.get("/")
     validate_response(response.get_json(), RESPONSE_SPEC_FILENAMES["info"])
@@ -427,6 +432,23 @@ def test_individuals_no_query(app_config, client, aioresponse):
     validate_response(response.get_json(), RESPONSE_SPEC_FILENAMES["count_response"])
 
 
+def test_individuals_no_query_with_overview_stats(app_config, client, aioresponse):
+    request_body = {"meta": {"apiVersion": "2.0.0"}, "query": {}, "bento": {"showSummaryStatistics": True}}
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_individuals(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_public_search_no_query(app_config, aioresponse)
+    first_data = client.post("/individuals", json=request_body).get_json()
+    assert first_data["responseSummary"]["numTotalResults"] == 2624
+    assert "biosamples" in first_data["info"]["bento"]
+
+    # total and overview are both reused for the next visitor
+    mock_permissions_all(app_config, aioresponse)
+    second_data = client.post("/individuals", json=request_body).get_json()
+    assert second_data["responseSummary"] == first_data["responseSummary"]
+    assert second_data["info"]["bento"] == first_data["info"]["bento"]
+
+
 def test_individuals_no_query_project_scoped(app_config, client, aioresponse):
     mock_permissions_all(app_config, aioresponse)
     mock_katsu_individuals_scoped(app_config, aioresponse)
@@ -441,6 +463,57 @@ def test_individuals_no_query_project_scoped(app_config, client, aioresponse):
 # --------------------------------------------------------
 
 
+def test_variants_query_with_filters(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_public_search_query(app_config, aioresponse, KATSU_QUERY_PARAMS)
+    private_search_url = app_config["KATSU_BASE_URL"] + app_config["KATSU_SEARCH_ENDPOINT"]
+    biosample_ids = ["hg00096", "hg00101", "hg00999"]
+    aioresponse.post(
+        private_search_url, payload={"results": {"dataset-1": {"data_type": "phenopacket", "matches": biosample_ids}}}
+    )
+    mock_gohan_query(app_config, aioresponse)
+    response = client.post("/g_variants", json=BEACON_REQUEST_BODY)
+    data = response.get_json()
+    assert response.status_code == 200
+    # only calls for the matching samples are counted
+    assert data["responseSummary"]["numTotalResults"] == 2
+
+
+def test_variants_batch_query(app_config, client, aioresponse):
+    mock_permissions_project_counts(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    gohan_count_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_COUNT_ENDPOINT"]
+    for lower_bound, count in ((101, 12), (201, 3)):
+        aioresponse.get(
+            re.compile(rf"{gohan_count_url}.*lowerBound={lower_bound}&.*"), payload={"results": [{"count": count}]}
+        )
+    allele = {"referenceName": "1", "assemblyId": "GRCh38", "referenceBases": "A", "alternateBases": "T"}
+    batch_request = {
+        "meta": {"apiVersion": "2.0.0"},
+        "query": {
+            "requestParameters": {
+                "g_variants": [
+                    {**allele, "start": [100]},
+                    {**allele, "start": [200]},  # below the censorship threshold
+                    {"referenceName": "1", "assemblyId": "GRCh38", "start": [300], "alternateBases": "T"},
+                    {**allele, "start": ["not a position"]},
+                    {"referenceName": "1", "assemblyId": "GRCh38", "start": [100, "x"], "end": [150, 200]},
+                    {**allele, "start": 100},
+                ]
+            }
+        },
+    }
+    response = client.post("/g_variants/batch", json=batch_request)
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["responseSummary"]["exists"]
+    summaries = data["batchResponses"]
+    assert summaries[0] == {"numTotalResults": 12, "exists": True}
+    assert summaries[1] == {"numTotalResults": 0, "exists": False}
+    assert all(s["error"]["errorCode"] == 400 for s in summaries[2:])
+
+
 def test_individuals_query_all_permissions(app_config, client, aioresponse):
     mock_permissions_all(app_config, aioresponse)
     mock_katsu_public_rules(app_config, aioresponse)
@@ -460,6 +533,23 @@ def test_individuals_query_all_permissions(app_config, client, aioresponse):
     assert data["responseSummary"]["numTotalResults"] == 9
 
 
+def test_individuals_query_results_cached(app_config, client, aioresponse):
+    request_body = deepcopy(BEACON_REQUEST_BODY)
+    del request_body["bento"]
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_public_search_query(app_config, aioresponse, KATSU_QUERY_PARAMS)
+    mock_katsu_private_search_query(app_config, aioresponse)
+    mock_gohan_query(app_config, aioresponse)
+    first_response = client.post("/individuals", json=request_body)
+
+    # the same query again only checks permissions, matches come from the first search
+    mock_permissions_all(app_config, aioresponse)
+    second_response = client.post("/individuals", json=request_body)
+    assert first_response.get_json()["responseSummary"]["numTotalResults"] == 9
+    assert second_response.get_json()["responseSummary"]["numTotalResults"] == 9
+
+
 def test_individuals_full_record_query_all_permissions(app_config, client, aioresponse):
     mock_permissions_all(app_config, aioresponse)
     mock_katsu_public_rules(app_config, aioresponse)
@@ -477,6 +567,79 @@ def test_individuals_full_record_query_all_permissions(app_config, client, aiore
     assert data["responseSummary"]["numTotalResults"] == 9
 
 
+def test_individuals_full_record_query_streamed(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_public_search_query(app_config, aioresponse, KATSU_QUERY_PARAMS)
+    mock_katsu_private_search_query(app_config, aioresponse)
+    mock_katsu_private_search_for_handover_files(app_config, aioresponse)
+    mock_katsu_private_search_for_phenopackets(app_config, aioresponse)
+    mock_katsu_private_search_overview(app_config, aioresponse)
+    mock_gohan_query(app_config, aioresponse)
+    mock_drs_queries(app_config, aioresponse)
+    response = client.post(
+        "/individuals", json=BEACON_FULL_RECORD_REQUEST_BODY, headers={"Accept": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["responseSummary"]["numTotalResults"] == 9
+    result_sets = {line["resultSet"]["id"]: line["resultSet"] for line in lines[1:]}
+    assert "resultsHandovers" in result_sets[PROJECT_2_DATASET]
+
+
+def test_individuals_full_record_query_paginated(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_public_search_query(app_config, aioresponse, KATSU_QUERY_PARAMS)
+    mock_katsu_private_search_query(app_config, aioresponse)
+    mock_katsu_private_search_for_handover_files(app_config, aioresponse)
+    mock_katsu_private_search_for_phenopackets(app_config, aioresponse)
+    mock_katsu_private_search_overview(app_config, aioresponse)
+    mock_gohan_query(app_config, aioresponse)
+    mock_drs_queries(app_config, aioresponse)
+    response = client.post("/individuals", json=BEACON_PAGINATED_FULL_RECORD_REQUEST_BODY)
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["responseSummary"]["numTotalResults"] == 9
+    page_tokens = data["info"]["pagination"]
+    assert "nextPage" in page_tokens
+    assert "previousPage" not in page_tokens
+
+    # second page doesn't search again, only retrieves phenopackets for this page
+    from bento_beacon.utils.query_cache import query_result_cache
+
+    query_result_cache.invalidate()
+    mock_katsu_private_search_for_handover_files(app_config, aioresponse)
+    mock_katsu_private_search_for_phenopackets(app_config, aioresponse)
+    mock_katsu_private_search_overview(app_config, aioresponse)
+    next_page_request = deepcopy(BEACON_PAGINATED_FULL_RECORD_REQUEST_BODY)
+    next_page_request["query"]["pagination"] = {"currentPage": page_tokens["nextPage"]}
+    response = client.post("/individuals", json=next_page_request)
+    data = response.get_json()
+    assert response.status_code == 200
+    assert data["responseSummary"]["numTotalResults"] == 9
+    assert "nextPage" not in data["info"]["pagination"]
+    assert "previousPage" in data["info"]["pagination"]
+    gohan_search_url = app_config["GOHAN_BASE_URL"] + app_config["GOHAN_SEARCH_ENDPOINT"] + "?" + GOHAN_QUERY_PARAMS
+    assert len(aioresponse.requests[("GET", URL(gohan_search_url))]) == 1
+
+    # the token only pages through the query it was issued for
+    other_query_request = deepcopy(next_page_request)
+    other_query_request["query"]["filters"] = [{"id": "sex", "operator": "=", "value": "MALE"}]
+    response = client.post("/individuals", json=other_query_request)
+    assert response.status_code == 400
+
+
+def test_individuals_full_record_query_bad_page_token(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    request_body = deepcopy(BEACON_FULL_RECORD_REQUEST_BODY)
+    request_body["query"]["pagination"] = {"currentPage": "not-a-token"}
+    response = client.post("/individuals", json=request_body)
+    assert response.status_code == 400
+
+
 def test_individuals_full_record_query_all_permissions_except_download(app_config, client, aioresponse):
     mock_permissions_all_except_download(app_config, aioresponse)
     mock_katsu_public_rules(app_config, aioresponse)
@@ -717,7 +880,8 @@ def test_individuals_query_dataset_with_dataset_permissions(app_config, client,
 def test_katsu_non_json_response_from_get(app_config, client, aioresponse):
     url = app_config["KATSU_BASE_URL"] + app_config["KATSU_PROJECTS_ENDPOINT"] + "?format=phenopackets"
     mock_service_down_response(aioresponse, "GET", url)
-    service_info_response = client.get("/service-info")
+    # unscoped requests don't need the project list, use a scoped one
+    service_info_response = client.get(f"/{PROJECT_1}/service-info")
     assert service_info_response.status_code == 500
 
 
@@ -747,7 +911,7 @@ def test_gohan_down_response(app_config, client, aioresponse):
 def test_katsu_get_client_error(app_config, client, aioresponse):
     url = app_config["KATSU_BASE_URL"] + app_config["KATSU_PROJECTS_ENDPOINT"] + "?format=phenopackets"
     mock_service_client_error(aioresponse, "GET", url)
-    response = client.get("/service-info")
+    response = client.get(f"/{PROJECT_1}/service-info")
     assert response.status_code == 500
 
 
@@ -772,3 +936,54 @@ def test_individuals_query_gohan_client_error(app_config, client, aioresponse):
     mock_service_client_error(aioresponse, "GET", url)
     response = client.post("/individuals", json=BEACON_REQUEST_BODY)
     assert response.status_code == 500
+
+
+# --------------------------------------------------------
+# caching
+# --------------------------------------------------------
+
+
+def test_censorship_settings_cached(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_individuals(app_config, aioresponse)
+    mock_katsu_individuals(app_config, aioresponse)
+    for _ in range(2):
+        response = client.get("/individuals")
+        assert response.status_code == 200
+    rules_url = app_config["KATSU_BASE_URL"] + app_config["KATSU_PUBLIC_RULES"]
+    assert len(aioresponse.requests[("GET", URL(rules_url))]) == 1
+
+
+def test_permissions_cached(app_config, client, aioresponse):
+    mock_permissions_all(app_config, aioresponse)
+    mock_katsu_public_rules(app_config, aioresponse)
+    mock_katsu_individuals(app_config, aioresponse)
+    mock_katsu_individuals(app_config, aioresponse)
+    for _ in range(2):
+        response = client.get("/individuals")
+        assert response.status_code == 200
+    authz_evaluate_url = app_config["AUTHZ_URL"] + "/policy/evaluate"
+    assert len(aioresponse.requests[("POST", URL(authz_evaluate_url))]) == 1
+
+
+def test_permissions_cache_ttl_from_app_config(app_config, client, aioresponse, monkeypatch):
+    monkeypatch.setitem(app_config, "AUTHZ_PERMISSIONS_CACHE_TTL_SECONDS", 0)
+    for _ in range(2):
+        mock_permissions_all(app_config, aioresponse)
+        mock_katsu_public_rules(app_config, aioresponse)
+        mock_katsu_individuals(app_config, aioresponse)
+        response = client.get("/individuals")
+        assert response.status_code == 200
+    authz_evaluate_url = app_config["AUTHZ_URL"] + "/policy/evaluate"
+    assert len(aioresponse.requests[("POST", URL(authz_evaluate_url))]) == 2
+
+
+def test_katsu_catalogue_cached(app_config, client, aioresponse):
+    mock_katsu_projects(app_config, aioresponse)
+    for path in (f"/{PROJECT_1}/service-info", "/", f"/{PROJECT_1}/"):
+        response = client.get(path)
+        assert response.status_code == 200
+    projects_url = app_config["KATSU_BASE_URL"] + app_config["KATSU_PROJECTS_ENDPOINT"] + "?format=phenopackets"
+    assert len(aioresponse.requests[("GET", URL(projects_url))]) == 1
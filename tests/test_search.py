@@ -0,0 +1,31 @@
+import asyncio
+from bento_beacon.utils.search import intersection_of_searches
+
+
+def test_intersection_of_searches():
+    async def ids(result, delay=0):
+        await asyncio.sleep(delay)
+        return result
+
+    async def run():
+        return await intersection_of_searches([ids(["a", "b", "c"]), ids(["b", "c", "d"], 0.01), ids(["c", "b"])])
+
+    assert sorted(asyncio.run(run())) == ["b", "c"]
+
+
+def test_intersection_of_searches_cancels_on_empty_result():
+    slow_search_finished = []
+
+    async def slow_search():
+        await asyncio.sleep(10)
+        slow_search_finished.append(True)
+        return ["a"]
+
+    async def empty_search():
+        return []
+
+    async def run():
+        return await asyncio.wait_for(intersection_of_searches([slow_search(), empty_search()]), timeout=1)
+
+    assert asyncio.run(run()) == []
+    assert not slow_search_finished